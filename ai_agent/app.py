@@ -1,16 +1,28 @@
 import os
+import sys
 import time
+import asyncio
+import bisect
+import heapq
+import contextvars
 import random
 import json
 import logging
 import difflib
-from typing import Optional, Dict, Any
-
-from fastapi import FastAPI
+import functools
+import threading
+import sqlite3
+from contextlib import asynccontextmanager
+from collections import OrderedDict, defaultdict
+from typing import Optional, Dict, Any, Tuple, List, Iterable, Callable, Awaitable
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
-import requests
+import httpx
 import re
 
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +34,77 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 NODE_BACKEND = os.getenv("NODE_BACKEND", "http://localhost:5000")
 
-app = FastAPI(title="Movi Python Agent")
+# Connection pool / timeout settings for the shared Node client (per worker).
+NODE_TIMEOUT_S = float(os.getenv("NODE_TIMEOUT_S", "10"))
+NODE_CONNECT_TIMEOUT_S = float(os.getenv("NODE_CONNECT_TIMEOUT_S", "3"))
+NODE_MAX_CONNECTIONS = int(os.getenv("NODE_MAX_CONNECTIONS", "100"))
+NODE_MAX_KEEPALIVE = int(os.getenv("NODE_MAX_KEEPALIVE", "20"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "15"))
+
+# Snapshot cache: serve fresh for SNAPSHOT_TTL_S, then serve stale for up to
+# SNAPSHOT_STALE_S more while a background refresh runs. TTL 0 disables it.
+SNAPSHOT_TTL_S = float(os.getenv("SNAPSHOT_TTL_S", "30"))
+SNAPSHOT_STALE_S = float(os.getenv("SNAPSHOT_STALE_S", "300"))
+
+# Intent parsing: "llm" (LLM, rules on failure), "rules" (never call the LLM)
+# or "hybrid" (confident rule parses win at once, otherwise the LLM gets
+# LLM_BUDGET_MS before the rule result is used).
+PARSE_MODE = os.getenv("PARSE_MODE", "llm").lower()
+LLM_BUDGET_MS = float(os.getenv("LLM_BUDGET_MS", "1200"))
+
+# LLM intent-parse cache (LRU + TTL), optionally persisted across restarts.
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "2048"))
+PARSE_CACHE_TTL_S = float(os.getenv("PARSE_CACHE_TTL_S", "86400"))
+PARSE_CACHE_FILE = os.getenv("PARSE_CACHE_FILE") or None
+
+# Pending confirmations: "memory" (per process) or "sqlite" (a WAL-mode file
+# shared by every worker on the host). Unconfirmed actions expire after TTL.
+PENDING_STORE = os.getenv("PENDING_STORE", "memory").lower()
+PENDING_DB_PATH = os.getenv("PENDING_DB_PATH", "pending.db")
+PENDING_TTL_S = float(os.getenv("PENDING_TTL_S", "600"))
+
+# Overall budget for the backend calls made while answering one request.
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "8"))
+
+# Optional same-host read path: when set, known read endpoints are answered
+# from the backend's SQLite file (opened read-only) instead of over HTTP.
+AGENT_DB_PATH = os.getenv("AGENT_DB_PATH") or None
+AGENT_DB_MMAP_MB = int(os.getenv("AGENT_DB_MMAP_MB", "256"))
+
+# /ai/agent/batch: max items per call, and how many read-only items run at once.
+AGENT_BATCH_MAX = int(os.getenv("AGENT_BATCH_MAX", "200"))
+AGENT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "16"))
+
+# Warm start: the last snapshots, their ETags and name indexes are saved here
+# and loaded at startup, so a restarted worker answers at once (and keeps
+# answering if the backend is down) while fresh data loads in the background.
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE") or None
+
+# Conversation sessions (AgentRequest.sessionId): the pending confirmation and
+# last resolved trip/route, kept SESSION_TTL_S after the last turn so
+# follow-ups ("how many bookings does it have") skip re-resolution.
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "300"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+
+# Bulk assignment planning: a vehicle or driver on a trip is busy for this
+# many minutes from its departure, so trips closer together cannot share one.
+TRIP_BLOCK_MINUTES = int(os.getenv("TRIP_BLOCK_MINUTES", "90"))
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    PARSE_CACHE.load()
+    WARM_START.load()
+    background = [spawn_background(_warm_snapshots()), spawn_background(WARM_START.run())]
+    yield
+    for task in background:
+        task.cancel()
+    WARM_START.save()
+    PARSE_CACHE.save()
+    await close_http_clients()
+
+
+app = FastAPI(title="Movi Python Agent", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -38,14 +120,312 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-PENDING: Dict[str, Dict[str, Any]] = {}
-
-
 class AgentRequest(BaseModel):
     input: Optional[str] = None
     currentPage: Optional[str] = None
     imageText: Optional[str] = None
     pendingId: Optional[str] = None
+    sessionId: Optional[str] = None
+
+
+# --------------------------
+# Metrics
+# --------------------------
+
+_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """
+    Minimal Prometheus histogram keyed by label values. ``observe`` is a
+    bisect plus two additions; cumulative buckets are only built on render.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = _LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            base = ",".join(
+                f'{n}="{_escape_label(v)}"' for n, v in zip(self.labelnames, labels)
+            )
+            sep = "," if base else ""
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {running}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {running}")
+        return lines
+
+
+class Counter:
+    """Minimal Prometheus counter keyed by label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] += amount
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            base = ",".join(
+                f'{n}="{_escape_label(v)}"' for n, v in zip(self.labelnames, labels)
+            )
+            lines.append(f"{self.name}{{{base}}} {value:g}")
+        return lines
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+PARSE_SECONDS = Histogram(
+    "movi_parse_seconds", "Intent parse time by deciding parser.", ("source",)
+)
+SNAPSHOT_SECONDS = Histogram(
+    "movi_snapshot_seconds", "Snapshot cache reads by key and result.", ("key", "result")
+)
+RESOLVE_SECONDS = Histogram(
+    "movi_resolve_seconds", "Trip/route name resolution time.", ("kind", "intent")
+)
+BACKEND_SECONDS = Histogram(
+    "movi_backend_seconds",
+    "Node backend calls by method, templated path, intent and status class.",
+    ("method", "path", "intent", "outcome"),
+)
+REQUEST_SECONDS = Histogram(
+    "movi_request_seconds", "Agent command handling time.", ("intent", "outcome")
+)
+BACKEND_GETS = Counter(
+    "movi_backend_gets_total",
+    "Backend GETs by templated path; shared=yes when joined to an identical in-flight GET.",
+    ("path", "shared"),
+)
+METRICS = (
+    PARSE_SECONDS, SNAPSHOT_SECONDS, RESOLVE_SECONDS, BACKEND_SECONDS, REQUEST_SECONDS,
+    BACKEND_GETS,
+)
+
+# Intent of the command being handled, used to label stage metrics.
+# Snapshot loads relabel themselves as "snapshot".
+_current_intent: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_intent", default="none"
+)
+
+# Progress sink of a streaming request (/ai/agent/stream): called with an
+# event name and payload as soon as each stage has something to show.
+_progress: contextvars.ContextVar[Optional[Callable[[str, Dict[str, Any]], None]]] = (
+    contextvars.ContextVar("progress", default=None)
+)
+
+
+def emit_progress(event: str, data: Dict[str, Any]):
+    sink = _progress.get()
+    if sink is not None:
+        sink(event, data)
+
+
+def note_resolved(kind: str, entity: Any, payload: Dict[str, Any]):
+    """A command resolved its trip/route: remember it for follow-ups and report it."""
+    session = _current_session.get()
+    if session is not None:
+        session.remember(kind, entity)
+    emit_progress(kind, payload)
+
+
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def _path_template(path: str) -> str:
+    """/api/bookings/trip/17/count -> /api/bookings/trip/:id/count"""
+    return _ID_SEGMENT_RE.sub("/:id", path.split("?", 1)[0])
+
+
+def _observe_backend(method: str, path: str, start: float, r: Optional[httpx.Response]):
+    outcome = f"{r.status_code // 100}xx" if r is not None else "error"
+    BACKEND_SECONDS.observe(
+        time.perf_counter() - start,
+        method, _path_template(path), _current_intent.get(), outcome,
+    )
+
+
+# --------------------------
+# Local read-only database (optional)
+# --------------------------
+
+
+class LocalReadDB:
+    """
+    Read-only access to the backend's movi.db for an agent on the same host.
+    Each route runs the same SQL as the matching Express handler, so callers
+    get identical payloads without the HTTP hop and JSON round trip. Queries
+    run in worker threads, each with its own connection (sqlite3 keeps a
+    per-connection cache of prepared statements). Writes always use HTTP.
+    """
+
+    def __init__(self, path: str, mmap_mb: int):
+        self._uri = f"file:{path}?mode=ro"
+        self._mmap_bytes = mmap_mb * 1024 * 1024
+        self._local = threading.local()
+        self._routes: List[Tuple[re.Pattern, Callable]] = [
+            (re.compile(r"/api/daily_trips"), self._daily_trips),
+            (re.compile(r"/api/routes"), self._routes_list),
+            (re.compile(r"/api/deployments"), self._deployments),
+            (re.compile(r"/api/helpers/deployment_for_trip/(\d+)"), self._deployment_for_trip),
+            (re.compile(r"/api/helpers/unassigned_trips"), self._unassigned_trips),
+            (re.compile(r"/api/bookings/trip/(\d+)"), self._bookings_for_trip),
+            (re.compile(r"/api/bookings/trip/(\d+)/count"), self._booking_count),
+            (re.compile(r"/api/bookings/counts"), self._booking_counts),
+        ]
+
+    def match(self, path: str) -> Optional[Callable[[dict], Any]]:
+        """Blocking reader for a backend GET path, or None if not served locally."""
+        for pattern, handler in self._routes:
+            m = pattern.fullmatch(path)
+            if m:
+                return functools.partial(handler, *m.groups())
+        return None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA mmap_size={self._mmap_bytes}")
+            conn.execute("PRAGMA query_only=1")
+            self._local.conn = conn
+        return conn
+
+    def _all(self, sql: str, args: tuple = ()) -> List[dict]:
+        return [dict(row) for row in self._conn().execute(sql, args)]
+
+    def _one(self, sql: str, args: tuple = ()) -> Optional[dict]:
+        row = self._conn().execute(sql, args).fetchone()
+        return dict(row) if row is not None else None
+
+    # one method per Express route (see backend/routes/)
+
+    def _daily_trips(self, params):
+        return self._all(
+            "SELECT trip_id, route_id, display_name, scheduled_date, live_status "
+            "FROM daily_trips LIMIT 1000"
+        )
+
+    def _routes_list(self, params):
+        return self._all(
+            "SELECT r.*, p.path_name FROM routes r LEFT JOIN paths p ON p.path_id = r.path_id"
+        )
+
+    def _deployments(self, params):
+        return self._all(
+            "SELECT deployment_id, trip_id, vehicle_id, driver_id FROM deployments"
+        )
+
+    def _deployment_for_trip(self, trip_id, params):
+        row = self._one(
+            "SELECT deployment_id, vehicle_id, driver_id FROM deployments WHERE trip_id = ? LIMIT 1",
+            (trip_id,),
+        )
+        if row is None:
+            return {"found": False}
+        return {"found": True, "deployment": row}
+
+    def _unassigned_trips(self, params):
+        scheduled_date = params.get("scheduled_date") or None
+        try:
+            limit = min(max(int(params.get("limit") or 100), 1), 1000)
+        except ValueError:
+            limit = 100
+        try:
+            offset = max(int(params.get("offset") or 0), 0)
+        except ValueError:
+            offset = 0
+        where = """
+            WHERE NOT EXISTS (SELECT 1 FROM deployments d WHERE d.trip_id = t.trip_id)
+              AND (? IS NULL OR t.scheduled_date = ?)
+        """
+        total = self._one(
+            f"SELECT COUNT(*) AS total FROM daily_trips t {where}",
+            (scheduled_date, scheduled_date),
+        )
+        rows = self._all(
+            f"""
+            SELECT t.trip_id, t.route_id, t.display_name, t.scheduled_date, t.live_status
+            FROM daily_trips t {where}
+            ORDER BY t.trip_id
+            LIMIT ? OFFSET ?
+            """,
+            (scheduled_date, scheduled_date, limit, offset),
+        )
+        return {
+            "trips": rows,
+            "total": total["total"] if total else 0,
+            "limit": limit,
+            "offset": offset,
+        }
+
+    def _bookings_for_trip(self, trip_id, params):
+        return self._all(
+            "SELECT * FROM bookings WHERE trip_id = ? AND status = 'confirmed'", (trip_id,)
+        )
+
+    def _booking_count(self, trip_id, params):
+        row = self._one(
+            "SELECT COUNT(*) AS count FROM bookings WHERE trip_id = ? AND status = 'confirmed'",
+            (trip_id,),
+        )
+        return {"trip_id": int(trip_id), "count": row["count"] if row else 0}
+
+    def _booking_counts(self, params):
+        rows = self._all(
+            """
+            SELECT t.trip_id, COUNT(b.booking_id) AS count
+            FROM daily_trips t
+            LEFT JOIN bookings b ON b.trip_id = t.trip_id AND b.status = 'confirmed'
+            WHERE t.scheduled_date = COALESCE(?, date('now'))
+            GROUP BY t.trip_id
+            """,
+            (params.get("scheduled_date") or None,),
+        )
+        return {str(r["trip_id"]): r["count"] for r in rows}
+
+
+def make_local_db() -> Optional[LocalReadDB]:
+    if not AGENT_DB_PATH:
+        return None
+    if not os.path.exists(AGENT_DB_PATH):
+        logger.warning("AGENT_DB_PATH %s not found; reading over HTTP", AGENT_DB_PATH)
+        return None
+    return LocalReadDB(AGENT_DB_PATH, AGENT_DB_MMAP_MB)
+
+
+LOCAL_DB = make_local_db()
 
 
 # --------------------------
@@ -53,40 +433,486 @@ class AgentRequest(BaseModel):
 # --------------------------
 
 
-def node_get(path: str, params: Optional[dict] = None):
-    url = NODE_BACKEND.rstrip("/") + path
-    logger.info("GET %s params=%s", url, params)
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
+_node_client: Optional[httpx.AsyncClient] = None
+_llm_client: Optional[httpx.AsyncClient] = None
+
+
+def get_node_client() -> httpx.AsyncClient:
+    """
+    Long-lived keep-alive client for the Node backend, created lazily on
+    first use so it binds to the worker's event loop.
+    """
+    global _node_client
+    if _node_client is None or _node_client.is_closed:
+        _node_client = httpx.AsyncClient(
+            base_url=NODE_BACKEND.rstrip("/"),
+            timeout=httpx.Timeout(NODE_TIMEOUT_S, connect=NODE_CONNECT_TIMEOUT_S),
+            limits=httpx.Limits(
+                max_connections=NODE_MAX_CONNECTIONS,
+                max_keepalive_connections=NODE_MAX_KEEPALIVE,
+            ),
+        )
+    return _node_client
+
+
+def get_llm_client() -> httpx.AsyncClient:
+    global _llm_client
+    if _llm_client is None or _llm_client.is_closed:
+        _llm_client = httpx.AsyncClient(timeout=LLM_TIMEOUT_S)
+    return _llm_client
+
+
+async def close_http_clients():
+    global _node_client, _llm_client
+    for client in (_node_client, _llm_client):
+        if client is not None and not client.is_closed:
+            await client.aclose()
+    _node_client = None
+    _llm_client = None
+
+
+# Monotonic deadline shared by every backend call of the current request.
+_request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+def _call_timeout(timeout: Optional[float]):
+    """Per-call timeout, clipped to whatever is left of the request deadline."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return timeout or httpx.USE_CLIENT_DEFAULT
+    remaining = max(deadline - time.monotonic(), 0.001)
+    return min(timeout or NODE_TIMEOUT_S, remaining)
+
+
+# Optional backend routes that returned 404 (older Node backend); the agent
+# stops probing them and uses the legacy endpoints instead.
+_BACKEND_UNSUPPORTED: set = set()
+
+
+def _is_not_found(e: Exception) -> bool:
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404
+
+
+def _mark_unsupported(feature: str):
+    if feature not in _BACKEND_UNSUPPORTED:
+        logger.info("Backend does not support %s; using fallback", feature)
+        _BACKEND_UNSUPPORTED.add(feature)
+
+
+def _json_or_none(r: httpx.Response):
     try:
         return r.json()
     except Exception:
-        logger.warning("Non-JSON response from %s", url)
+        logger.warning("Non-JSON response from %s", r.request.url)
         return None
 
 
-def node_post(path: str, json_body: Optional[dict] = None):
-    url = NODE_BACKEND.rstrip("/") + path
-    logger.info("POST %s body=%s", url, json_body)
-    r = requests.post(url, json=json_body, timeout=10)
-    r.raise_for_status()
+# Last ETag and decoded payload per revalidated GET (path, params).
+_ETAG_CACHE: Dict[Tuple[str, Tuple], Tuple[str, Any]] = {}
+
+
+# In-flight GETs (single-flight): identical concurrent calls share one task
+# and its result, so callers must treat returned payloads as read-only.
+_INFLIGHT_GETS: Dict[Tuple, asyncio.Task] = {}
+
+
+async def node_get(
+    path: str,
+    params: Optional[dict] = None,
+    timeout: Optional[float] = None,
+    revalidate: bool = False,
+    decode: Optional[Callable[[Any], Any]] = None,
+):
+    """
+    GET a backend path and return its JSON, passed through ``decode`` if
+    given. With ``revalidate`` the last ETag is sent as If-None-Match and the
+    previous decoded value is reused on 304. A call identical to one already
+    in flight waits for that call instead of issuing its own.
+    """
+    key = (path, tuple(sorted((params or {}).items())), revalidate, decode)
+    task = _INFLIGHT_GETS.get(key)
+    if task is None:
+        task = spawn_background(_node_get(path, params, timeout, revalidate, decode))
+        _INFLIGHT_GETS[key] = task
+        task.add_done_callback(lambda t: _INFLIGHT_GETS.get(key) is t and _INFLIGHT_GETS.pop(key))
+        BACKEND_GETS.inc(_path_template(path), "no")
+    else:
+        BACKEND_GETS.inc(_path_template(path), "yes")
+    # one caller giving up must not cancel the call for the others
+    return await asyncio.shield(task)
+
+
+async def _node_get(path, params, timeout, revalidate, decode):
+    logger.info("GET %s params=%s", path, params)
+    read = LOCAL_DB.match(path) if LOCAL_DB is not None else None
+    if read is not None:
+        start = time.perf_counter()
+        try:
+            value = await asyncio.to_thread(read, params or {})
+        except Exception as e:
+            logger.warning("Local DB read of %s failed, using HTTP: %s", path, e)
+        else:
+            BACKEND_SECONDS.observe(
+                time.perf_counter() - start,
+                "GET", _path_template(path), _current_intent.get(), "local",
+            )
+            return decode(value) if decode else value
+
+    key = (path, tuple(sorted((params or {}).items())))
+    cached = _ETAG_CACHE.get(key) if revalidate else None
+    headers = {"If-None-Match": cached[0]} if cached else None
+
+    start, r = time.perf_counter(), None
     try:
-        return r.json()
-    except Exception:
-        logger.warning("Non-JSON response from %s", url)
-        return None
+        r = await get_node_client().get(
+            path, params=params, headers=headers, timeout=_call_timeout(timeout)
+        )
+    finally:
+        _observe_backend("GET", path, start, r)
+    if cached and r.status_code == 304:
+        return cached[1]
+    r.raise_for_status()
+    value = _json_or_none(r)
+    if decode:
+        value = decode(value)
+    if revalidate:
+        etag = r.headers.get("etag")
+        if etag:
+            _ETAG_CACHE[key] = (etag, value)
+        else:
+            _ETAG_CACHE.pop(key, None)
+    return value
+
+
+# Snapshot keys invalidated when the agent itself writes under a path prefix.
+_WRITE_INVALIDATES: Dict[str, Tuple[str, ...]] = {
+    # removing a deployment cancels the trip's bookings on the backend
+    "/api/deployments": ("deployments", "booking_counts"),
+    "/api/bookings": ("booking_counts",),
+}
+
+
+def _invalidate_for_write(path: str):
+    # GETs already in flight may return pre-write data; later callers start anew
+    _INFLIGHT_GETS.clear()
+    for prefix, keys in _WRITE_INVALIDATES.items():
+        if path.startswith(prefix):
+            SNAPSHOTS.invalidate(*keys)
 
 
-def node_delete(path: str):
-    url = NODE_BACKEND.rstrip("/") + path
-    logger.info("DELETE %s", url)
-    r = requests.delete(url, timeout=10)
+async def node_post(
+    path: str, json_body: Optional[Any] = None, timeout: Optional[float] = None
+):
+    logger.info("POST %s body=%s", path, json_body)
+    start, r = time.perf_counter(), None
+    try:
+        r = await get_node_client().post(
+            path, json=json_body, timeout=_call_timeout(timeout)
+        )
+    finally:
+        _observe_backend("POST", path, start, r)
+        _invalidate_for_write(path)
     r.raise_for_status()
+    return _json_or_none(r)
+
+
+async def node_delete(path: str, timeout: Optional[float] = None):
+    logger.info("DELETE %s", path)
+    start, r = time.perf_counter(), None
     try:
-        return r.json()
-    except Exception:
-        logger.warning("Non-JSON response from %s", url)
-        return None
+        r = await get_node_client().delete(
+            path, timeout=_call_timeout(timeout)
+        )
+    finally:
+        _observe_backend("DELETE", path, start, r)
+        _invalidate_for_write(path)
+    r.raise_for_status()
+    return _json_or_none(r)
+
+
+# --------------------------
+# Snapshot cache
+# --------------------------
+
+# Strong references to fire-and-forget tasks (the loop only keeps weak ones).
+_BACKGROUND_TASKS: set = set()
+
+
+def spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+    # nobody may await the task; retrieve failures so they are not reported
+    # as "exception was never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+
+
+class SnapshotCache:
+    """
+    In-process cache for whole-table snapshots (trips, routes, deployments).
+
+    Entries younger than ``ttl`` are returned directly. Entries past ``ttl``
+    but within ``ttl + stale`` are returned as-is while one background task
+    refreshes them (stale-while-revalidate). Anything older, or missing, is
+    loaded inline; concurrent callers share the same load. If that inline
+    load fails, an expired entry is still returned (stale-if-error).
+    """
+
+    def __init__(self, ttl: float, stale: float):
+        self.ttl = ttl
+        self.stale = stale
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._generation: Dict[str, int] = {}
+        # bumped on every stored load, so savers can tell when to write again
+        self.updates = 0
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        scope = _snapshot_scope.get()
+        if scope is None:
+            return await self._get(key, loader)
+        # inside a batch: every item shares one read of each snapshot
+        task = scope.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._get(key, loader))
+            scope[key] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # let later items in the batch retry a failed read
+            if scope.get(key) is task:
+                del scope[key]
+            raise
+
+    async def _get(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        start = time.perf_counter()
+        if self.ttl <= 0:
+            value = await loader()
+            SNAPSHOT_SECONDS.observe(time.perf_counter() - start, key, "uncached")
+            return value
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                SNAPSHOT_SECONDS.observe(time.perf_counter() - start, key, "hit")
+                return entry[1]
+            if age < self.ttl + self.stale:
+                self._start_load(key, loader)
+                SNAPSHOT_SECONDS.observe(time.perf_counter() - start, key, "stale")
+                return entry[1]
+
+        try:
+            value = await asyncio.shield(self._start_load(key, loader))
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning("Serving expired %s snapshot; refresh failed: %s", key, e)
+            SNAPSHOT_SECONDS.observe(time.perf_counter() - start, key, "stale")
+            return entry[1]
+        SNAPSHOT_SECONDS.observe(time.perf_counter() - start, key, "miss")
+        return value
+
+    async def refresh(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Load ``key`` now (joining a load in flight), whatever its age."""
+        if self.ttl <= 0:
+            return await loader()
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def has(self, key: str) -> bool:
+        return key in self._entries
+
+    def values(self) -> Dict[str, Any]:
+        return {key: value for key, (_, value) in self._entries.items()}
+
+    def restore(self, values: Dict[str, Any]):
+        """Seed entries that are already stale: served at once, refreshed on use."""
+        stamp = time.monotonic() - self.ttl
+        for key, value in values.items():
+            self._entries.setdefault(key, (stamp, value))
+
+    def invalidate(self, *keys: str):
+        scope = _snapshot_scope.get()
+        for key in keys:
+            if scope is not None:
+                scope.pop(key, None)
+            self._entries.pop(key, None)
+            # loads already in flight may return pre-write data; detach them
+            self._loading.pop(key, None)
+            self._generation[key] = self._generation.get(key, 0) + 1
+            logger.info("Snapshot %s invalidated", key)
+
+    def _start_load(self, key: str, loader) -> asyncio.Task:
+        task = self._loading.get(key)
+        if task is None:
+            task = spawn_background(self._load(key, loader))
+            self._loading[key] = task
+        return task
+
+    async def _load(self, key: str, loader):
+        # shared loads outlive the request that started them
+        _request_deadline.set(None)
+        _current_intent.set("snapshot")
+        generation = self._generation.get(key, 0)
+        try:
+            value = await loader()
+            if self._generation.get(key, 0) == generation:
+                self._entries[key] = (time.monotonic(), value)
+                self.updates += 1
+            return value
+        except Exception as e:
+            if key in self._entries:
+                logger.warning("Background refresh of %s failed: %s", key, e)
+            raise
+        finally:
+            if self._loading.get(key) is asyncio.current_task():
+                del self._loading[key]
+
+
+SNAPSHOTS = SnapshotCache(SNAPSHOT_TTL_S, SNAPSHOT_STALE_S)
+
+# Per-batch snapshot reads (key -> task), set by /ai/agent/batch and compound
+# commands (a compound command inside a batch uses the batch's).
+_snapshot_scope: contextvars.ContextVar[Optional[Dict[str, asyncio.Future]]] = (
+    contextvars.ContextVar("snapshot_scope", default=None)
+)
+
+
+# --------------------------
+# Pending confirmations
+# --------------------------
+
+
+class InMemoryPendingStore:
+    """Pending confirmations held by this process, with TTL eviction."""
+
+    SWEEP_INTERVAL_S = 30.0
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._items: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._swept_at = time.time()
+
+    async def put(self, pending_id: str, record: Dict[str, Any]):
+        now = time.time()
+        if now - self._swept_at >= self.SWEEP_INTERVAL_S:
+            self.sweep()
+        self._items[pending_id] = (now + self.ttl, record)
+
+    async def take(self, pending_id: str) -> Optional[Dict[str, Any]]:
+        """Remove and return a live pending record (None if missing/expired)."""
+        item = self._items.pop(pending_id, None)
+        if item is None or item[0] < time.time():
+            return None
+        return item[1]
+
+    def sweep(self) -> int:
+        now = time.time()
+        self._swept_at = now
+        expired = [pid for pid, (expires_at, _) in self._items.items() if expires_at < now]
+        for pid in expired:
+            del self._items[pid]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLitePendingStore:
+    """
+    Pending confirmations in a local SQLite file in WAL mode, so a "yes"
+    handled by any uvicorn worker on the host finds the pending action.
+    Each call runs in a worker thread: another worker holding the write lock
+    makes that thread wait (up to the busy timeout), not the event loop.
+    """
+
+    SWEEP_INTERVAL_S = 30.0
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending (
+              pending_id TEXT PRIMARY KEY,
+              payload TEXT NOT NULL,
+              expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pending_expires ON pending(expires_at)"
+        )
+        self._swept_at = time.time()
+
+    async def put(self, pending_id: str, record: Dict[str, Any]):
+        await asyncio.to_thread(self._put, pending_id, record)
+
+    async def take(self, pending_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically claim a live pending record, so only one worker runs it."""
+        return await asyncio.to_thread(self._take, pending_id)
+
+    def _put(self, pending_id: str, record: Dict[str, Any]):
+        now = time.time()
+        if now - self._swept_at >= self.SWEEP_INTERVAL_S:
+            self.sweep()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending(pending_id, payload, expires_at) VALUES (?, ?, ?)",
+                (pending_id, json.dumps(record), now + self.ttl),
+            )
+
+    def _take(self, pending_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT payload, expires_at FROM pending WHERE pending_id = ?",
+                    (pending_id,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM pending WHERE pending_id = ?", (pending_id,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def sweep(self) -> int:
+        now = time.time()
+        self._swept_at = now
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM pending WHERE expires_at < ?", (now,))
+        return cur.rowcount
+
+    def __len__(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM pending WHERE expires_at >= ?", (time.time(),)
+            ).fetchone()
+        return row[0]
+
+
+def make_pending_store():
+    if PENDING_STORE == "sqlite":
+        return SQLitePendingStore(PENDING_DB_PATH, PENDING_TTL_S)
+    return InMemoryPendingStore(PENDING_TTL_S)
+
+
+PENDING = make_pending_store()
 
 
 # --------------------------
@@ -94,7 +920,7 @@ def node_delete(path: str):
 # --------------------------
 
 
-def call_llm(prompt: str):
+async def call_llm(prompt: str):
     if not OPENAI_API_KEY:
         return None
 
@@ -109,17 +935,175 @@ def call_llm(prompt: str):
         "temperature": 0.0,
     }
 
-    resp = requests.post(
+    resp = await get_llm_client().post(
         "https://api.openai.com/v1/chat/completions",
         headers=headers,
         json=payload,
-        timeout=15,
     )
     resp.raise_for_status()
     j = resp.json()
     return j["choices"][0]["message"]["content"].strip()
 
 
+_INTENT_PROMPT = """
+You are an assistant for a bus transport operations system.
+
+Extract intent and target_text from this user message.
+
+Allowed intents:
+- "remove_vehicle": user wants to unassign/cancel a vehicle or deployment from a trip.
+- "assign_vehicle": user wants to allocate/assign/deploy a vehicle (and optional driver) to a trip.
+- "trip_query": asking about a specific trip or bus service (status, bookings, vehicle, etc.).
+- "route_query": asking about a bus route (stops, direction, trips on that route, etc.).
+- "list_trips": asking to list today's trips.
+- "list_unassigned_trips": asking which trips don't have a vehicle/bus assigned.
+- "list_routes": asking to list the available routes.
+- "tripsheet": asking for a tripsheet / trip summary for a specific trip.
+- "trips_in_window": asking which trips depart within a time range (e.g. "trips between 8 and 9:30").
+- "next_departure": asking for the next departure of a service (e.g. "next departure on TechLoop").
+- "plan_assignments": asking to assign vehicles/drivers to all unassigned trips at once (auto-assign, bulk plan).
+- "confirm": confirming a pending destructive action (yes, proceed, okay, etc.).
+- "greeting": simple greeting like hi/hello.
+- "unknown": anything else.
+
+For intents that relate to a specific trip or route
+("remove_vehicle", "assign_vehicle", "trip_query", "tripsheet"),
+set target_text to the most relevant trip phrase mentioned
+(for example "Bulk - 00:01", "TechLoop - 09:00").
+
+For trips_in_window, set target_text to the window as 24-hour "HH:MM-HH:MM"
+(for example "08:00-09:30"). For next_departure, set target_text to the
+service name without a time (for example "TechLoop").
+
+For list_trips, list_routes, list_unassigned_trips, plan_assignments, target_text can be null.
+
+Respond ONLY with valid JSON in this shape:
+{{"intent": "<one of the intents above>", "target_text": <string or null>}}
+
+Message: "{text}"
+"""
+
+
+class ParseCache:
+    """
+    LRU + TTL cache of LLM intent parses keyed on normalized input text.
+    Optionally persisted to a JSON file so it survives restarts.
+    """
+
+    SAVE_INTERVAL_S = 60.0
+
+    def __init__(self, max_size: int, ttl: float, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._dirty = False
+        self._saved_at = time.time()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return _normalize_name(text)
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        key = self.key(text)
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] >= self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def put(self, text: str, parsed: Dict[str, Any]):
+        if self.max_size <= 0:
+            return
+        key = self.key(text)
+        self._entries[key] = (
+            time.time(),
+            {"intent": parsed.get("intent"), "target": parsed.get("target")},
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._dirty = True
+        if time.time() - self._saved_at >= self.SAVE_INTERVAL_S:
+            self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxSize": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning("Could not load parse cache from %s: %s", self.path, e)
+            return
+        if data.get("model") != OPENAI_MODEL:
+            logger.info("Parse cache at %s is for another model; ignoring", self.path)
+            return
+        now = time.time()
+        for key, stored_at, value in data.get("entries", []):
+            if now - stored_at < self.ttl:
+                self._entries[key] = (stored_at, value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        logger.info("Loaded %d parse cache entries from %s", len(self._entries), self.path)
+
+    def save(self):
+        self._saved_at = time.time()
+        if not self.path or not self._dirty:
+            return
+        data = {
+            "model": OPENAI_MODEL,
+            "entries": [[k, ts, v] for k, (ts, v) in self._entries.items()],
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.warning("Could not save parse cache to %s: %s", self.path, e)
+
+
+PARSE_CACHE = ParseCache(PARSE_CACHE_SIZE, PARSE_CACHE_TTL_S, PARSE_CACHE_FILE)
+
+
+async def llm_parse_intent(text: str) -> Dict[str, Any]:
+    """Parse intent with the LLM, answering repeated phrasings from the cache."""
+    cached = PARSE_CACHE.get(text)
+    if cached is not None:
+        cached["source"] = "cache"
+        return cached
+
+    llm_out = await call_llm(_INTENT_PROMPT.format(text=text))
+    parsed_json = json.loads(llm_out) if llm_out else {}
+    parsed = {
+        "intent": parsed_json.get("intent"),
+        "target": parsed_json.get("target_text"),
+    }
+    if llm_out:
+        PARSE_CACHE.put(text, parsed)
+    parsed["source"] = "llm"
+    return parsed
+
+
 # --------------------------
 # Matching helpers
 # --------------------------
@@ -130,139 +1114,728 @@ def _normalize_name(s: str) -> str:
     return " ".join((s or "").lower().split())
 
 
-def fetch_daily_trips():
-    """Fetch today's trips from the Node backend."""
-    resp = node_get("/api/daily_trips")
+class NameResolver:
+    """
+    Prebuilt matcher over normalized names with a character n-gram index.
+
+    Keeps the precedence of the original linear matcher: exact normalized
+    key, then the first key (in insertion order) that contains or is
+    contained in the target, then a difflib fuzzy match. The index narrows
+    the substring and fuzzy steps to keys sharing n-grams with the target.
+    """
+
+    NGRAM = 3
+    FUZZY_CUTOFF = 0.6
+    # below this many keys the fuzzy step scores every key, exactly like
+    # difflib.get_close_matches over the full list
+    LINEAR_FUZZY_MAX = 200
+    FUZZY_POOL = 64
+
+    def __init__(self, pairs: Iterable[Tuple[str, Any]]):
+        self._keys: List[str] = []
+        self._items: List[Any] = []
+        self._by_key: Dict[str, int] = {}
+        index: Dict[str, List[int]] = defaultdict(list)
+        for key, item in pairs:
+            if not key:
+                continue
+            pos = self._by_key.get(key)
+            if pos is not None:
+                # same semantics as the old candidates dict: last item wins,
+                # first insertion position is kept
+                self._items[pos] = item
+                continue
+            pos = len(self._keys)
+            self._by_key[key] = pos
+            self._keys.append(key)
+            self._items.append(item)
+            for gram in self._grams(key):
+                index[gram].append(pos)
+        self._index = dict(index)
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def _grams(cls, s: str) -> set:
+        n = cls.NGRAM
+        return {s[i:i + n] for i in range(len(s) - n + 1)}
+
+    def best(self, target_text: str):
+        ranked = self.top_k(target_text, k=1)
+        return ranked[0][0] if ranked else None
+
+    def top_k(self, target_text: str, k: int = 5) -> List[Tuple[Any, float]]:
+        """
+        Ranked ``(item, score)`` candidates: exact match first, then
+        substring matches in insertion order, then fuzzy matches by ratio.
+        Scores are difflib similarity ratios (1.0 for an exact match).
+        """
+        target = _normalize_name(target_text)
+        if not target or not self._keys or k <= 0:
+            return []
+
+        ranked: List[Tuple[int, float]] = []
+        seen = set()
+
+        exact = self._by_key.get(target)
+        if exact is not None:
+            ranked.append((exact, 1.0))
+            seen.add(exact)
+
+        if len(ranked) < k:
+            for pos in sorted(self._substring_hits(target)):
+                if pos not in seen:
+                    seen.add(pos)
+                    ranked.append((pos, self._ratio(target, self._keys[pos])))
+                    if len(ranked) >= k:
+                        break
+
+        if len(ranked) < k:
+            pool = [self._keys[p] for p in self._fuzzy_pool(target) if p not in seen]
+            for key in difflib.get_close_matches(
+                target, pool, n=k - len(ranked), cutoff=self.FUZZY_CUTOFF
+            ):
+                ranked.append((self._by_key[key], self._ratio(target, key)))
+
+        return [(self._items[pos], score) for pos, score in ranked]
+
+    @staticmethod
+    def _ratio(a: str, b: str) -> float:
+        return round(difflib.SequenceMatcher(None, a, b).ratio(), 4)
+
+    def _substring_hits(self, target: str) -> set:
+        hits = set()
+
+        # keys contained in the target: look up every substring of the target
+        by_key = self._by_key
+        length = len(target)
+        for i in range(length):
+            for j in range(i + 1, length + 1):
+                pos = by_key.get(target[i:j])
+                if pos is not None:
+                    hits.add(pos)
+
+        # target contained in a key: intersect the target's posting lists
+        grams = self._grams(target)
+        if not grams:
+            hits.update(p for p, key in enumerate(self._keys) if target in key)
+            return hits
+        postings = sorted((self._index.get(g, ()) for g in grams), key=len)
+        if not postings[0]:
+            return hits
+        candidates = set(postings[0])
+        for plist in postings[1:]:
+            candidates.intersection_update(plist)
+            if not candidates:
+                return hits
+        hits.update(p for p in candidates if target in self._keys[p])
+        return hits
+
+    def _fuzzy_pool(self, target: str) -> List[int]:
+        if len(self._keys) <= self.LINEAR_FUZZY_MAX:
+            return list(range(len(self._keys)))
+
+        postings = sorted(
+            (self._index[g] for g in self._grams(target) if g in self._index),
+            key=len,
+        )
+        if not postings:
+            return []
+        # skip grams shared by a large share of all keys (e.g. " - ")
+        common = max(1000, len(self._keys) // 10)
+        selective = [p for p in postings if len(p) <= common] or postings[:2]
+        counts: Dict[int, int] = defaultdict(int)
+        for plist in selective:
+            for pos in plist:
+                counts[pos] += 1
+        return sorted(counts, key=counts.__getitem__, reverse=True)[: self.FUZZY_POOL]
+
+
+class TripRecord:
+    """One trip of a snapshot, with the backend's key aliases resolved."""
+
+    __slots__ = (
+        "trip_id", "route_id", "display_name", "scheduled_date", "live_status",
+        "departure",
+    )
+
+    def __init__(self, trip_id, route_id, display_name: str,
+                 scheduled_date: Optional[str], live_status: Optional[str]):
+        self.trip_id = trip_id
+        self.route_id = route_id
+        self.display_name = display_name
+        self.scheduled_date = scheduled_date
+        self.live_status = live_status
+        # minute of the day from the time in the name ("Bulk - 00:01" -> 1)
+        self.departure = _departure_minute(display_name)
+
+    @classmethod
+    def from_row(cls, row: dict) -> "TripRecord":
+        trip_id = row.get("trip_id") or row.get("id") or row.get("tripId")
+        try:
+            trip_id = int(trip_id)
+        except (TypeError, ValueError):
+            pass
+        name = row.get("display_name") or row.get("name") or row.get("trip_name") or ""
+        date = row.get("scheduled_date") or row.get("date")
+        status = row.get("live_status")
+        return cls(
+            trip_id,
+            row.get("route_id") or row.get("routeId"),
+            sys.intern(name),
+            sys.intern(date) if isinstance(date, str) else date,
+            sys.intern(status) if isinstance(status, str) else status,
+        )
+
+    @property
+    def label(self) -> str:
+        return self.display_name or f"Trip {self.trip_id}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON form for responses; fields the backend did not send are left out."""
+        out: Dict[str, Any] = {"trip_id": self.trip_id}
+        if self.route_id is not None:
+            out["route_id"] = self.route_id
+        out["display_name"] = self.display_name
+        if self.scheduled_date is not None:
+            out["scheduled_date"] = self.scheduled_date
+        if self.live_status is not None:
+            out["live_status"] = self.live_status
+        return out
+
+
+class TripSnapshot:
+    """
+    Today's trips as compact records, normalized once per snapshot load,
+    with O(1) lookup by trip_id. Iterates and slices like the list it replaces.
+
+    A departure-time index (all trips, and per service name) and a
+    route_id grouping are built on first use, so window, next-departure and
+    per-route queries do not scan the whole day.
+    """
+
+    __slots__ = ("records", "by_id", "_times", "_timed", "_services", "_by_route")
+
+    def __init__(self, rows: Iterable[dict]):
+        self.records: List[TripRecord] = [TripRecord.from_row(r) for r in rows]
+        self.by_id: Dict[Any, TripRecord] = {
+            t.trip_id: t for t in self.records if t.trip_id is not None
+        }
+        self._times: Optional[List[int]] = None
+        self._timed: List[TripRecord] = []
+        # service key -> (display name, departure minutes, trips)
+        self._services: Dict[str, Tuple[str, List[int], List[TripRecord]]] = {}
+        self._by_route: Optional[Dict[str, List[TripRecord]]] = None
+
+    def on_route(self, route_id) -> List[TripRecord]:
+        """Trips of one route, in snapshot order."""
+        if self._by_route is None:
+            by_route: Dict[str, List[TripRecord]] = defaultdict(list)
+            for t in self.records:
+                if t.route_id is not None:
+                    by_route[str(t.route_id)].append(t)
+            self._by_route = dict(by_route)
+        return self._by_route.get(str(route_id), []) if route_id is not None else []
+
+    def _time_index(self) -> Tuple[List[int], List[TripRecord]]:
+        if self._times is None:
+            timed = sorted(
+                (t for t in self.records if t.departure is not None),
+                key=lambda t: t.departure,
+            )
+            grouped: Dict[str, List[TripRecord]] = defaultdict(list)
+            for t in timed:
+                grouped[_service_key(t.display_name)].append(t)
+            self._services = {
+                key: (_service_name(trips[0].display_name), [t.departure for t in trips], trips)
+                for key, trips in grouped.items()
+            }
+            self._timed = timed
+            self._times = [t.departure for t in timed]
+        return self._times, self._timed
+
+    def departing_between(self, start: int, end: int) -> List[TripRecord]:
+        """Trips departing in [start, end] (minutes of the day), by time.
+        A window with start > end wraps past midnight."""
+        times, timed = self._time_index()
+        if start <= end:
+            return timed[bisect.bisect_left(times, start):bisect.bisect_right(times, end)]
+        return timed[bisect.bisect_left(times, start):] + timed[:bisect.bisect_right(times, end)]
+
+    def service_keys(self) -> List[str]:
+        self._time_index()
+        return list(self._services)
+
+    def service_name(self, key: str) -> str:
+        self._time_index()
+        return self._services[key][0]
+
+    def next_departure(self, key: str, after: int) -> Optional[TripRecord]:
+        """First trip of a service departing at or after ``after``."""
+        self._time_index()
+        _, times, trips = self._services[key]
+        i = bisect.bisect_left(times, after)
+        return trips[i] if i < len(trips) else None
+
+    def first_departure(self, key: str) -> Optional[TripRecord]:
+        self._time_index()
+        trips = self._services[key][2]
+        return trips[0] if trips else None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def get(self, trip_id) -> Optional[TripRecord]:
+        try:
+            return self.by_id.get(int(trip_id))
+        except (TypeError, ValueError):
+            return self.by_id.get(trip_id)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [t.to_dict() for t in self.records]
+
+
+# Resolvers are built once per snapshot list and reused until it changes.
+_RESOLVERS: Dict[str, Tuple[Any, NameResolver]] = {}
+
+
+def _resolver_for(kind: str, source: list, build: Callable[[list], NameResolver]):
+    cached = _RESOLVERS.get(kind)
+    if cached is None or cached[0] is not source:
+        cached = (source, build(source))
+        _RESOLVERS[kind] = cached
+    return cached[1]
+
+
+def build_trip_resolver(trips: TripSnapshot) -> NameResolver:
+    return NameResolver((_normalize_name(t.display_name), t) for t in trips)
+
+
+def build_service_resolver(trips: TripSnapshot) -> NameResolver:
+    return NameResolver((key, key) for key in trips.service_keys())
+
+
+def _route_keys(routes: list):
+    for r in routes:
+        name = r.get("route_display_name") or r.get("display_name") or r.get("name") or ""
+        yield _normalize_name(name), r
+        rid = r.get("route_id") or r.get("id") or r.get("routeId")
+        if rid is not None:
+            yield str(rid), r
+
+
+def build_route_resolver(routes: list) -> NameResolver:
+    return NameResolver(_route_keys(routes))
+
+
+async def fetch_daily_trips():
+    """Today's trips, served from the snapshot cache."""
+    return await SNAPSHOTS.get("daily_trips", _load_daily_trips)
+
+
+def _list_payload(resp, key: str, path: str) -> list:
+    """The row list of a backend list endpoint (bare list or wrapped)."""
     if isinstance(resp, list):
         return resp
     if isinstance(resp, dict):
-        for key in ("trips", "data", "items"):
-            val = resp.get(key)
+        for k in (key, "data", "items"):
+            val = resp.get(k)
             if isinstance(val, list):
                 return val
-    logger.warning("Unexpected /api/daily_trips payload shape: %s", type(resp))
+    logger.warning("Unexpected %s payload shape: %s", path, type(resp))
     return []
 
 
-def find_best_trip_match(target_text: str, trips: list):
+def _decode_daily_trips(resp) -> TripSnapshot:
+    return TripSnapshot(_list_payload(resp, "trips", "/api/daily_trips"))
+
+
+async def _load_daily_trips() -> TripSnapshot:
+    """Fetch today's trips from the Node backend."""
+    return await node_get("/api/daily_trips", revalidate=True, decode=_decode_daily_trips)
+
+
+def find_best_trip_match(target_text: str, trips: TripSnapshot) -> Optional[TripRecord]:
     """Best-effort trip match using display_name with fuzzy logic."""
     if not target_text or not trips:
         return None
+    start = time.perf_counter()
+    match = _resolver_for("trips", trips, build_trip_resolver).best(target_text)
+    RESOLVE_SECONDS.observe(time.perf_counter() - start, "trip", _current_intent.get())
+    if match is not None:
+        note_resolved("trip", match, match.to_dict())
+    return match
 
-    target_norm = _normalize_name(target_text)
-    if not target_norm:
-        return None
 
-    candidates: Dict[str, Any] = {}
-    for t in trips:
-        name = t.get("display_name") or t.get("name") or t.get("trip_name") or ""
-        n = _normalize_name(name)
-        if not n:
-            continue
-        candidates[n] = t
+async def _resolve_trip(parsed_intent: Dict[str, Any], target_text: str) -> Optional[TripRecord]:
+    """
+    The trip a command is about: the session's last trip for a follow-up
+    (no fetch, no matching), otherwise the best match in today's snapshot.
+    Snapshot errors propagate.
+    """
+    trip = parsed_intent.get("context_trip")
+    if trip is not None:
+        note_resolved("trip", trip, trip.to_dict())
+        return trip
+    return find_best_trip_match(target_text, await fetch_daily_trips())
+
+
+async def fetch_routes():
+    """Routes, served from the snapshot cache."""
+    return await SNAPSHOTS.get("routes", _load_routes)
+
+
+async def _load_routes():
+    """Fetch routes from the Node backend."""
+    return await node_get("/api/routes", revalidate=True, decode=_decode_routes)
 
-    if not candidates:
+
+def _decode_routes(resp) -> list:
+    return _list_payload(resp, "routes", "/api/routes")
+
+
+def find_best_route_match(target_text: str, routes: list):
+    """Best-effort route match based on name or id."""
+    if not target_text or not routes:
         return None
+    start = time.perf_counter()
+    match = _resolver_for("routes", routes, build_route_resolver).best(target_text)
+    RESOLVE_SECONDS.observe(time.perf_counter() - start, "route", _current_intent.get())
+    if match is not None:
+        note_resolved("route", match, match)
+    return match
 
-    # exact normalized name
-    if target_norm in candidates:
-        return candidates[target_norm]
 
-    # substring match
-    for n, trip in candidates.items():
-        if target_norm in n or n in target_norm:
-            return trip
+async def fetch_deployments():
+    """Deployments (used for list_unassigned_trips), from the snapshot cache."""
+    return await SNAPSHOTS.get("deployments", _load_deployments)
 
-    # fuzzy match on normalized names
-    names = list(candidates.keys())
-    close = difflib.get_close_matches(target_norm, names, n=1, cutoff=0.6)
-    if close:
-        return candidates[close[0]]
-    return None
 
+async def _load_deployments():
+    """Fetch all deployments from the Node backend."""
+    return await node_get("/api/deployments", revalidate=True, decode=_decode_deployments)
 
-def fetch_routes():
-    """Fetch routes from the Node backend."""
-    resp = node_get("/api/routes")
-    if isinstance(resp, list):
-        return resp
-    if isinstance(resp, dict):
-        for key in ("routes", "data", "items"):
-            val = resp.get(key)
-            if isinstance(val, list):
-                return val
-    logger.warning("Unexpected /api/routes payload shape: %s", type(resp))
-    return []
 
+def _decode_deployments(resp) -> list:
+    return _list_payload(resp, "deployments", "/api/deployments")
+
+
+UNASSIGNED_PAGE_SIZE = 500
+# Most rows one listing pages in; the reply names ten and counts the rest.
+UNASSIGNED_MAX_ROWS = 2000
+
+
+def _unassigned_client_side(trips: TripSnapshot, deployments: list) -> list:
+    """Anti-join trips against deployments in Python (older backends)."""
+    deployed_trip_ids = set()
+    for d in deployments or []:
+        tid = d.get("trip_id") or d.get("tripId")
+        if tid is not None:
+            deployed_trip_ids.add(int(tid))
+
+    return [
+        t.to_dict()
+        for t in trips
+        if isinstance(t.trip_id, int) and t.trip_id not in deployed_trip_ids
+    ]
+
+
+async def fetch_unassigned_trips(
+    scheduled_date: Optional[str] = None, max_rows: int = UNASSIGNED_MAX_ROWS
+) -> Tuple[list, int]:
+    """
+    (trips with no deployment, how many there are in total). Pages through the
+    backend anti-join endpoint, stopping after ``max_rows``; older backends
+    without it fall back to joining the trip and deployment snapshots
+    client-side.
+    """
+    if "unassigned_trips" not in _BACKEND_UNSUPPORTED:
+        try:
+            trips: list = []
+            total = 0
+            while len(trips) < max_rows:
+                params = {
+                    "limit": min(UNASSIGNED_PAGE_SIZE, max_rows - len(trips)),
+                    "offset": len(trips),
+                }
+                if scheduled_date:
+                    params["scheduled_date"] = scheduled_date
+                page = await node_get("/api/helpers/unassigned_trips", params=params)
+                rows = (page or {}).get("trips") or []
+                total = int((page or {}).get("total", 0))
+                trips.extend(rows)
+                if not rows or len(trips) >= total:
+                    break
+            return trips, max(total, len(trips))
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            _mark_unsupported("unassigned_trips")
+
+    trips, deployments = await asyncio.gather(fetch_daily_trips(), fetch_deployments())
+    if scheduled_date:
+        trips = [t for t in trips if _on_date(t, scheduled_date)]
+    unassigned = _unassigned_client_side(trips, deployments)
+    return unassigned[:max_rows], len(unassigned)
+
+
+# --------------------------
+# Warm start
+# --------------------------
+
+
+class WarmStartFile:
+    """
+    On-disk copy of the snapshot cache, the ETags it was fetched with and the
+    name resolvers built over it. Written with pickle (temp file + atomic
+    replace) and read back through mmap, so a restart restores ready-built
+    indexes instead of refetching and re-indexing. Restored snapshots start
+    out stale: the first use revalidates them, usually with a cheap 304.
+
+    The file is trusted input (pickle); keep it where only the agent writes.
+    """
+
+    FORMAT = 1
+    SAVE_INTERVAL_S = 60.0
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.restored_at: Optional[float] = None  # save time of the restored copy
+        self.warmed = False  # every snapshot loaded (or revalidated) this run
+        self._saved_updates = 0
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        import gc
+        import mmap
+        import pickle
+
+        start = time.perf_counter()
+        # unpickling allocates millions of objects; cyclic GC passes over
+        # them would roughly double the load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self.path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mm:
+                data = pickle.loads(mm)
+        except Exception as e:
+            logger.warning("Could not load snapshots from %s: %s", self.path, e)
+            return False
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if data.get("format") != self.FORMAT or data.get("backend") != NODE_BACKEND:
+            logger.info("Snapshot file %s is for another backend or format; ignoring", self.path)
+            return False
+        SNAPSHOTS.restore(data["snapshots"])
+        for key, value in data["etags"].items():
+            _ETAG_CACHE.setdefault(key, value)
+        for kind, value in data["resolvers"].items():
+            _RESOLVERS.setdefault(kind, value)
+        self.restored_at = data["savedAt"]
+        self._saved_updates = SNAPSHOTS.updates
+        logger.info(
+            "Restored snapshots %s from %s in %.1f ms (saved %.0fs ago)",
+            sorted(data["snapshots"]), self.path,
+            (time.perf_counter() - start) * 1000, time.time() - self.restored_at,
+        )
+        return True
+
+    def _state(self) -> Dict[str, Any]:
+        snapshots = SNAPSHOTS.values()
+        live = {id(v) for v in snapshots.values()}
+        return {
+            "format": self.FORMAT,
+            "backend": NODE_BACKEND,
+            "savedAt": time.time(),
+            "snapshots": snapshots,
+            # only state derived from the saved snapshots, so it stays consistent
+            "etags": {k: v for k, v in _ETAG_CACHE.items() if id(v[1]) in live},
+            "resolvers": {k: v for k, v in _RESOLVERS.items() if id(v[0]) in live},
+        }
+
+    def save(self, state: Optional[Dict[str, Any]] = None):
+        if not self.path:
+            return
+        import pickle
+
+        state = state or self._state()
+        if not state["snapshots"]:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.warning("Could not save snapshots to %s: %s", self.path, e)
+
+    async def run(self):
+        """Save in a worker thread whenever snapshots changed, at most every
+        SAVE_INTERVAL_S."""
+        if not self.path or SNAPSHOTS.ttl <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.SAVE_INTERVAL_S)
+            if SNAPSHOTS.updates != self._saved_updates:
+                self._saved_updates = SNAPSHOTS.updates
+                await asyncio.to_thread(self.save, self._state())
+
+    def status(self) -> Dict[str, Any]:
+        ready = self.warmed or SNAPSHOTS.has("daily_trips")
+        return {
+            "ready": ready,
+            "warmed": self.warmed,
+            "restoredFromDisk": self.restored_at is not None,
+            "restoredAgeS": (
+                round(time.time() - self.restored_at, 1) if self.restored_at else None
+            ),
+        }
+
+
+WARM_START = WarmStartFile(SNAPSHOT_FILE)
+
+
+async def _warm_snapshots():
+    """
+    Load every snapshot and its name index once at startup, retrying with
+    backoff until the backend answers. Restored copies (if any) are served
+    in the meantime.
+    """
+    delay = 1.0
+    while True:
+        try:
+            trips, routes, _ = await asyncio.gather(
+                SNAPSHOTS.refresh("daily_trips", _load_daily_trips),
+                SNAPSHOTS.refresh("routes", _load_routes),
+                SNAPSHOTS.refresh("deployments", _load_deployments),
+            )
+            _resolver_for("trips", trips, build_trip_resolver)
+            _resolver_for("services", trips, build_service_resolver)
+            _resolver_for("routes", routes, build_route_resolver)
+            WARM_START.warmed = True
+            logger.info("Snapshots warmed: %d trips, %d routes", len(trips), len(routes))
+            return
+        except Exception as e:
+            logger.warning("Snapshot warm-up failed (%s); retrying in %.0fs", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+# --------------------------
+# Intent parsing helpers
+# --------------------------
+
+
+_TIME_RE = re.compile(r"\d{1,2}:\d{2}")
+_STATUS_WRAPPER_RE = re.compile(
+    r"^(?:what\s+is\s+the\s+status\s+of\s+"
+    r"|what\s+is\s+status\s+of\s+"
+    r"|status\s+of\s+"
+    r"|status\s+for\s+"
+    r"|status\s+)"
+)
+_TO_PHRASE_RE = re.compile(r"\bto\s+(.+)$", re.IGNORECASE)
+_FOR_PHRASE_RE = re.compile(r"\bfor\s+(.+)$", re.IGNORECASE)
+_VEHICLE_ID_RE = re.compile(r"\bvehicle\s+(\d+)\b", re.IGNORECASE)
+_BUS_ID_RE = re.compile(r"\bbus\s+(\d+)\b", re.IGNORECASE)
+_DRIVER_ID_RE = re.compile(r"\bdriver\s+(\d+)\b", re.IGNORECASE)
+
+# Departure times: the last HH:MM in a trip name, and its trailing separator.
+_NAME_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})(?!.*\d{1,2}:\d{2})")
+_NAME_TIME_SUFFIX_RE = re.compile(r"[\s\-–]*\d{1,2}:\d{2}\s*$")
+
+# Clock times in messages: "8", "08:30", "8.30", "8am", "9:30 pm".
+_CLOCK = r"(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?"
+_WINDOW_RE = re.compile(
+    r"\b(?:between|from)\s+" + _CLOCK + r"\s*(?:and|to|-|–)\s*" + _CLOCK + r"(?![\w:])",
+    re.IGNORECASE,
+)
+_BARE_WINDOW_RE = re.compile(
+    r"^\s*" + _CLOCK + r"\s*(?:and|to|-|–)\s*" + _CLOCK + r"\s*$", re.IGNORECASE
+)
+_AFTER_BEFORE_RE = re.compile(r"\b(after|before)\s+" + _CLOCK + r"(?![\w:])", re.IGNORECASE)
+_NEXT_DEPARTURE_RE = re.compile(
+    r"\bnext\s+(?:departure|trip|bus|service|run)s?\s+(?:on|for|of|to|from)\s+(.+?)"
+    r"(?:\s+(?:after|from)\s+\d{1,2}(?:[:.]\d{2})?\s*(?:am|pm)?)?\s*\??$"
+    r"|\bnext\s+(.+?)\s+(?:departure|trip|bus|service|run)\b",
+    re.IGNORECASE,
+)
 
-def find_best_route_match(target_text: str, routes: list):
-    """Best-effort route match based on name or id."""
-    if not target_text or not routes:
-        return None
 
-    target_norm = _normalize_name(target_text)
-    if not target_norm:
-        return None
+def _departure_minute(name: str) -> Optional[int]:
+    m = _NAME_TIME_RE.search(name or "")
+    return _minute_of_day(int(m.group(1)), int(m.group(2))) if m else None
 
-    candidates: Dict[str, Any] = {}
-    for r in routes:
-        name = (
-            r.get("route_display_name")
-            or r.get("display_name")
-            or r.get("name")
-            or ""
-        )
-        n = _normalize_name(name)
-        if n:
-            candidates[n] = r
 
-        rid = r.get("route_id") or r.get("id") or r.get("routeId")
-        if rid is not None:
-            candidates[str(rid)] = r
+def _service_name(name: str) -> str:
+    """'TechLoop - 09:00' -> 'TechLoop' (the trip name without its time)."""
+    return _NAME_TIME_SUFFIX_RE.sub("", name or "").strip()
 
-    if not candidates:
-        return None
 
-    # direct id or exact name match
-    if target_norm in candidates:
-        return candidates[target_norm]
+def _service_key(name: str) -> str:
+    return _normalize_name(_service_name(name))
 
-    # substring match
-    for n, route in candidates.items():
-        if target_norm in n or n in target_norm:
-            return route
 
-    # fuzzy match
-    keys = list(candidates.keys())
-    close = difflib.get_close_matches(target_norm, keys, n=1, cutoff=0.6)
-    if close:
-        return candidates[close[0]]
+def _minute_of_day(hour: int, minute: int) -> Optional[int]:
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return hour * 60 + minute
     return None
 
 
-def fetch_deployments():
-    """Fetch all deployments (used for list_unassigned_trips)."""
-    resp = node_get("/api/deployments")
-    if isinstance(resp, list):
-        return resp
-    if isinstance(resp, dict):
-        for key in ("deployments", "data", "items"):
-            val = resp.get(key)
-            if isinstance(val, list):
-                return val
-    logger.warning("Unexpected /api/deployments payload shape: %s", type(resp))
-    return []
+def _clock_minutes(hour: str, minute: Optional[str], suffix: Optional[str]) -> Optional[int]:
+    h, m = int(hour), int(minute or 0)
+    if suffix:
+        if not 1 <= h <= 12:
+            return None
+        h = h % 12 + (12 if suffix.lower() == "pm" else 0)
+    return _minute_of_day(h, m)
 
 
-# --------------------------
-# Intent parsing helpers
-# --------------------------
+def _format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _parse_time_window(text: str) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) minutes of the day from "between 8 and 9:30", "from 8am to
+    9am", "after 18:00", "before 7" or a bare "08:00-09:30". A trailing am/pm
+    also applies to the start ("between 8 and 9 pm").
+    """
+    if not text:
+        return None
+    m = _WINDOW_RE.search(text) or _BARE_WINDOW_RE.match(text)
+    if m:
+        h1, m1, s1, h2, m2, s2 = m.groups()
+        if not s1 and s2 and not (s2.lower() == "pm" and int(h1) > int(h2) and int(h1) != 12):
+            s1 = s2
+        start, end = _clock_minutes(h1, m1, s1), _clock_minutes(h2, m2, s2)
+        if start is None or end is None:
+            return None
+        return start, end
+    m = _AFTER_BEFORE_RE.search(text)
+    if m:
+        point = _clock_minutes(*m.groups()[1:])
+        if point is None:
+            return None
+        return (point, 24 * 60 - 1) if m.group(1).lower() == "after" else (0, point)
+    return None
 
 
 def _looks_like_trip_or_route_name(text: str) -> bool:
     t = text.strip()
     # very simple heuristic: contains a time or a dash pattern
-    if re.search(r"\d{1,2}:\d{2}", t):
+    if _TIME_RE.search(t):
         return True
     if "-" in t:
         return True
@@ -272,21 +1845,10 @@ def _looks_like_trip_or_route_name(text: str) -> bool:
 def _strip_status_wrappers(text: str) -> str:
     """Remove 'status of', 'what is the status of', etc. from the front."""
     t = (text or "").strip()
-    tl = t.lower()
-
-    patterns = [
-        r"^(what\s+is\s+the\s+status\s+of\s+)",
-        r"^(what\s+is\s+status\s+of\s+)",
-        r"^(status\s+of\s+)",
-        r"^(status\s+for\s+)",
-        r"^(status\s+)",
-    ]
-
-    for pat in patterns:
-        m = re.match(pat, tl)
-        if m:
-            # cut off exactly the matched prefix length from original string
-            return t[m.end():].strip()
+    m = _STATUS_WRAPPER_RE.match(t.lower())
+    if m:
+        # cut off exactly the matched prefix length from original string
+        return t[m.end():].strip()
     return t
 
 
@@ -304,9 +1866,7 @@ def _extract_trip_phrase_from_text(text: str) -> Optional[str]:
             return parts[1].strip()
 
     # after 'to' or 'for'
-    m = re.search(r"\bto\s+(.+)$", text, flags=re.IGNORECASE)
-    if not m:
-        m = re.search(r"\bfor\s+(.+)$", text, flags=re.IGNORECASE)
+    m = _TO_PHRASE_RE.search(text) or _FOR_PHRASE_RE.search(text)
     if m:
         return m.group(1).strip()
 
@@ -324,16 +1884,142 @@ def _extract_vehicle_and_driver(text: str):
     """
     if not text:
         return None, None
-    v_match = re.search(r"\bvehicle\s+(\d+)\b", text, flags=re.IGNORECASE)
-    if not v_match:
-        v_match = re.search(r"\bbus\s+(\d+)\b", text, flags=re.IGNORECASE)
-    d_match = re.search(r"\bdriver\s+(\d+)\b", text, flags=re.IGNORECASE)
+    v_match = _VEHICLE_ID_RE.search(text) or _BUS_ID_RE.search(text)
+    d_match = _DRIVER_ID_RE.search(text)
 
     vehicle_id = int(v_match.group(1)) if v_match else None
     driver_id = int(d_match.group(1)) if d_match else None
     return vehicle_id, driver_id
 
 
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex for a keyword trie; at any position it matches the longest keyword."""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node) -> str:
+        branches = [re.escape(ch) + emit(sub) for ch, sub in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """
+    Single-pass substring matcher over named keyword groups.
+
+    A trie-shaped regex with a lookahead at every position finds the longest
+    keyword starting there; keywords contained in a found keyword are implied.
+    ``match(text)`` returns a bitmask of the groups with at least one keyword
+    occurring in ``text`` (same result as ``any(k in text for k in group)``).
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.bit = {name: 1 << i for i, name in enumerate(groups)}
+        members: Dict[str, int] = defaultdict(int)
+        for name, words in groups.items():
+            for word in words:
+                members[word] |= self.bit[name]
+
+        first_chars = "".join(sorted({re.escape(k[0]) for k in members}))
+        self._re = re.compile(
+            "(?=[" + first_chars + "])(?=(" + _trie_pattern(members) + "))"
+        )
+        # finding a keyword also finds every keyword contained in it
+        self._mask = {
+            k: _or_all(members[o] for o in members if o in k) for k in members
+        }
+
+    def match(self, text: str) -> int:
+        hits = 0
+        for kw in self._re.findall(text):
+            hits |= self._mask[kw]
+        return hits
+
+
+def _or_all(values: Iterable[int]) -> int:
+    out = 0
+    for v in values:
+        out |= v
+    return out
+
+
+_GREETINGS = frozenset(("hi", "hello", "hey", "hey movi", "hi movi"))
+_CONFIRMATIONS = frozenset(("yes", "y", "confirm", "proceed", "ok", "okay", "sure"))
+
+# Compound commands: split on ";", "then", and on "and" when a new command
+# follows ("remove ... and assign ..."), not inside "vehicle 3 and driver 5".
+# Only words the rule parser routes on start a step, so "... and check the
+# bookings" or "assign vehicle 3 and get it to X" stay one command.
+_STEP_VERBS = (
+    r"(?:remove|delete|unassign|cancel|deassign|assign|allocate|deploy|show|list|"
+    r"what|which|status|(?:generate\s+(?:a\s+|the\s+)?)?trip\s?sheet)"
+)
+_STEP_SPLIT_RE = re.compile(
+    r"\s*(?:;|,?\s+and\s+then\s+|,?\s+then\s+|,?\s+and\s+(?=(?:also\s+|now\s+)?"
+    + _STEP_VERBS
+    + r"\b))\s*",
+    re.IGNORECASE,
+)
+
+
+def _split_steps(text: str) -> List[str]:
+    """'remove X and assign vehicle 4 to Y' -> ['remove X', 'assign vehicle 4 to Y']."""
+    lowered = text.lower()
+    if ";" not in text and " and " not in lowered and " then " not in lowered:
+        return [text]
+    return [p for p in (part.strip(" ,.") for part in _STEP_SPLIT_RE.split(text)) if p]
+
+# Keyword tables of the rule parser, compiled once into a single-pass matcher.
+_INTENT_KEYWORDS = KeywordMatcher(
+    {
+        "remove": ("remove", "delete", "unassign", "cancel", "deassign"),
+        "remove_object": ("vehicle", "trip", "deployment", "bus"),
+        "assign": ("assign", "allocate", "deploy"),
+        "assign_object": ("vehicle", "bus"),
+        # every unassigned trip at once (see also _BULK_ASSIGN_RE)
+        "plan_assignments": (
+            "auto assign", "auto-assign", "autoassign", "bulk assign",
+            "plan assignment", "plan the assignment", "plan vehicle assignment",
+            "assignment plan", "optimize assignment", "optimise assignment",
+        ),
+        "tripsheet": ("tripsheet", "trip sheet", "trip summary"),
+        "summary": ("summary",),
+        "list": ("show", "list"),
+        "trip": ("trip", "trips"),
+        "route": ("route", "routes"),
+        "unassigned": ("no vehicle", "without vehicle", "without bus", "unassigned"),
+        "unassigned_object": ("trip", "trips", "bus", "buses"),
+        "route_query": ("route", "routes", "line", "corridor", "path"),
+        "query": (
+            "what", "show", "list", "which", "status", "running", "runs", "from", "to",
+        ),
+        # treat "status of X" / "trip status" / "bus status" as trip queries
+        # even if the word "trip" is not explicitly present
+        "trip_query": (
+            "trip", "trips", "service", "bus", "deployment", "booking", "bookings",
+            "status of", "trip status", "bus status",
+        ),
+        "generic_query": ("status", "list", "show"),
+        "departures": (
+            "trip", "trips", "bus", "buses", "service", "departure", "departures",
+            "departing", "depart", "leaving", "leave",
+        ),
+    }
+)
+_KW = _INTENT_KEYWORDS.bit
+# "assign vehicles to all unassigned trips": a verb of its own (the keyword
+# groups match substrings, and "unassigned" contains "assign").
+_BULK_ASSIGN_RE = re.compile(r"\b(?:assign|allocate|deploy|plan|fill|cover)\b.*\bunassigned\b")
+
+
 def fallback_parse_intent(user_text: str):
     text = (user_text or "").lower().strip()
     out = {"intent": "unknown", "target": None}
@@ -342,20 +2028,27 @@ def fallback_parse_intent(user_text: str):
         return out
 
     # greetings
-    if text in ("hi", "hello", "hey", "hey movi", "hi movi"):
+    if text in _GREETINGS:
         out["intent"] = "greeting"
         return out
 
     # confirmations
-    if text in ("yes", "y", "confirm", "proceed", "ok", "okay", "sure"):
+    if text in _CONFIRMATIONS:
         out["intent"] = "confirm"
         return out
 
-    # remove / delete intents (vehicle or trip operations)
-    remove_keywords = ("remove", "delete", "unassign", "cancel", "deassign")
-    if any(w in text for w in remove_keywords) and any(
-        k in text for k in ("vehicle", "trip", "deployment", "bus")
+    hits = _INTENT_KEYWORDS.match(text)
+
+    # plan vehicles and drivers for every unassigned trip
+    # (before remove/assign: "unassigned" contains both verbs)
+    if hits & _KW["plan_assignments"] or (
+        "unassigned" in text and _BULK_ASSIGN_RE.search(text)
     ):
+        out["intent"] = "plan_assignments"
+        return out
+
+    # remove / delete intents (vehicle or trip operations)
+    if hits & _KW["remove"] and hits & _KW["remove_object"]:
         out["intent"] = "remove_vehicle"
         # attempt to find target phrase
         if " from " in user_text:
@@ -370,99 +2063,64 @@ def fallback_parse_intent(user_text: str):
         return out
 
     # assign vehicle intent
-    assign_keywords = ("assign", "allocate", "deploy")
-    if any(w in text for w in assign_keywords) and any(
-        k in text for k in ("vehicle", "bus")
-    ):
+    if hits & _KW["assign"] and hits & _KW["assign_object"]:
         out["intent"] = "assign_vehicle"
         out["target"] = _extract_trip_phrase_from_text(user_text)
         return out
 
     # tripsheet / summary
-    if "tripsheet" in text or "trip sheet" in text or "trip summary" in text or (
-        "summary" in text and "trip" in text
-    ):
+    if hits & _KW["tripsheet"] or (hits & _KW["summary"] and hits & _KW["trip"]):
         out["intent"] = "tripsheet"
         out["target"] = _extract_trip_phrase_from_text(user_text)
         return out
 
+    # next departure of a service ("next departure on TechLoop")
+    m = _NEXT_DEPARTURE_RE.search(user_text) if "next" in text else None
+    if m:
+        out["intent"] = "next_departure"
+        out["target"] = (m.group(1) or m.group(2)).strip()
+        return out
+
+    # departures in a time window ("trips between 08:00 and 09:30")
+    if hits & _KW["departures"]:
+        window = _parse_time_window(text)
+        if window is not None:
+            out["intent"] = "trips_in_window"
+            out["target"] = f"{_format_minutes(window[0])}-{_format_minutes(window[1])}"
+            return out
+
     # list trips
-    if (
-        (("show" in text) or ("list" in text)) and ("trip" in text or "trips" in text)
-    ) or text in ("show trips", "list trips", "show all trips", "list all trips"):
+    if hits & _KW["list"] and hits & _KW["trip"]:
         out["intent"] = "list_trips"
         out["target"] = user_text
         return out
 
     # list routes
-    if (
-        (("show" in text) or ("list" in text)) and ("route" in text or "routes" in text)
-    ) or text in ("show routes", "list routes", "show all routes", "list all routes"):
+    if hits & _KW["list"] and hits & _KW["route"]:
         out["intent"] = "list_routes"
         out["target"] = user_text
         return out
 
     # list unassigned trips
-    if (
-        "no vehicle" in text
-        or "without vehicle" in text
-        or "without bus" in text
-        or "unassigned" in text
-    ) and ("trip" in text or "trips" in text or "bus" in text or "buses" in text):
+    if hits & _KW["unassigned"] and hits & _KW["unassigned_object"]:
         out["intent"] = "list_unassigned_trips"
         out["target"] = user_text
         return out
 
     # route-related queries
-    route_keywords = ("route", "routes", "line", "corridor", "path")
-    query_keywords = (
-        "what",
-        "show",
-        "list",
-        "which",
-        "status",
-        "running",
-        "runs",
-        "from",
-        "to",
-    )
-    if any(k in text for k in route_keywords) and any(
-        q in text for q in query_keywords
-    ):
+    if hits & _KW["route_query"] and hits & _KW["query"]:
         out["intent"] = "route_query"
         out["target"] = user_text
         return out
 
     # trip-related queries (status of a bus/trip)
-    trip_keywords = (
-        "trip",
-        "trips",
-        "service",
-        "bus",
-        "deployment",
-        "booking",
-        "bookings",
-    )
-    # treat "status of X" / "trip status" / "bus status" as trip queries even
-    # if the word "trip" is not explicitly present
-    if (
-        any(k in text for k in trip_keywords)
-        or "status of" in text
-        or "trip status" in text
-        or "bus status" in text
-    ) and any(q in text for q in query_keywords):
+    if hits & _KW["trip_query"] and hits & _KW["query"]:
         out["intent"] = "trip_query"
         out["target"] = user_text
         return out
 
     # generic query fallback
-    if (
-        text.startswith("how many")
-        or text.startswith("what")
-        or "status" in text
-        or "list" in text
-        or "show" in text
-    ):
+    if text.startswith(("how many", "what")) or hits & _KW["generic_query"]:
         out["intent"] = "query"
         out["target"] = user_text
         return out
@@ -476,12 +2134,514 @@ def fallback_parse_intent(user_text: str):
     return out
 
 
+# Rule-parser intents trusted in hybrid mode without consulting the LLM.
+_CONFIDENT_RULE_INTENTS = {
+    "greeting",
+    "confirm",
+    "list_routes",
+    "list_unassigned_trips",
+    "trips_in_window",
+    "next_departure",
+    "plan_assignments",
+}
+# Trip-scoped rule intents are trusted when the target names a trip by time.
+_TRIP_SCOPED_RULE_INTENTS = {
+    "remove_vehicle",
+    "assign_vehicle",
+    "tripsheet",
+    "trip_query",
+}
+
+
+def _rule_parse_is_confident(parsed: Dict[str, Any]) -> bool:
+    intent = parsed.get("intent")
+    if intent in _CONFIDENT_RULE_INTENTS:
+        return True
+    target = parsed.get("target") or ""
+    return intent in _TRIP_SCOPED_RULE_INTENTS and bool(_TIME_RE.search(target))
+
+
+async def parse_intent(text: str) -> Dict[str, Any]:
+    """
+    Parse a message according to PARSE_MODE. The returned dict carries a
+    "source" key recording which parser decided: "rules", "llm", "cache",
+    "rules_budget" (LLM over budget) or "rules_fallback" (LLM failed).
+    """
+    if PARSE_MODE == "rules" or not OPENAI_API_KEY or not text:
+        parsed = fallback_parse_intent(text)
+        parsed["source"] = "rules"
+        return parsed
+
+    if PARSE_MODE != "hybrid":
+        try:
+            return await llm_parse_intent(text)
+        except Exception as e:
+            logger.warning("LLM parse failed: %s - falling back", e)
+            parsed = fallback_parse_intent(text)
+            parsed["source"] = "rules_fallback"
+            return parsed
+
+    rule_parsed = fallback_parse_intent(text)
+    if _rule_parse_is_confident(rule_parsed):
+        rule_parsed["source"] = "rules"
+        return rule_parsed
+
+    # an over-budget LLM call keeps running and still fills the parse cache
+    llm_task = spawn_background(llm_parse_intent(text))
+    try:
+        return await asyncio.wait_for(asyncio.shield(llm_task), LLM_BUDGET_MS / 1000)
+    except asyncio.TimeoutError:
+        logger.info("LLM parse over %.0f ms budget; using rule parse", LLM_BUDGET_MS)
+        rule_parsed["source"] = "rules_budget"
+    except Exception as e:
+        logger.warning("LLM parse failed: %s - falling back", e)
+        rule_parsed["source"] = "rules_fallback"
+    return rule_parsed
+
+
+# --------------------------
+# Per-trip lookups
+# --------------------------
+
+
+def _extract_deployment(dep):
+    """Normalize a /api/helpers/deployment_for_trip payload to the row or None."""
+    if isinstance(dep, dict):
+        if dep.get("found") and dep.get("deployment"):
+            return dep["deployment"]
+        if dep.get("deployment"):
+            return dep["deployment"]
+        return None
+    return dep
+
+
+def _count_bookings(b) -> int:
+    if isinstance(b, list):
+        return len(b)
+    if isinstance(b, dict):
+        return int(b.get("count", 0))
+    return int(b or 0)
+
+
+async def fetch_booking_counts():
+    """Today's {trip_id: confirmed_count} aggregate, from the snapshot cache."""
+    return await SNAPSHOTS.get("booking_counts", _load_booking_counts)
+
+
+async def _load_booking_counts():
+    resp = await node_get("/api/bookings/counts")
+    if not isinstance(resp, dict):
+        logger.warning("Unexpected /api/bookings/counts payload shape: %s", type(resp))
+        return {}
+    return {str(k): int(v or 0) for k, v in resp.items()}
+
+
+async def fetch_booking_count(trip_id, use_aggregate: bool = True) -> int:
+    """
+    Confirmed bookings on a trip. Prefers the cached day aggregate, then the
+    count-only route, then len() of the booking rows on older backends.
+    Pass use_aggregate=False when the count guards a destructive action.
+    """
+    if use_aggregate and "booking_counts" not in _BACKEND_UNSUPPORTED:
+        try:
+            counts = await fetch_booking_counts()
+            if str(trip_id) in counts:
+                return counts[str(trip_id)]
+        except Exception as e:
+            if _is_not_found(e):
+                _mark_unsupported("booking_counts")
+            else:
+                logger.warning("Booking aggregate unavailable: %s", e)
+
+    if "booking_count" not in _BACKEND_UNSUPPORTED:
+        try:
+            return _count_bookings(
+                await node_get(f"/api/bookings/trip/{trip_id}/count")
+            )
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            _mark_unsupported("booking_count")
+
+    return _count_bookings(await node_get(f"/api/bookings/trip/{trip_id}"))
+
+
+async def fetch_trip_lookups(trip_id, bookings: str = "count"):
+    """
+    Fetch the deployment and the bookings of a trip concurrently.
+
+    ``bookings`` selects the second lookup: "count" (aggregate-backed count),
+    "fresh_count" (skip the cached aggregate) or "rows" (full booking list).
+    Returns (deployment_payload, bookings_result); either may be the
+    exception raised by its call, so callers keep their own error handling.
+    """
+    if bookings == "rows":
+        bookings_call = node_get(f"/api/bookings/trip/{trip_id}")
+    else:
+        bookings_call = fetch_booking_count(
+            trip_id, use_aggregate=bookings != "fresh_count"
+        )
+    dep, result = await asyncio.gather(
+        node_get(f"/api/helpers/deployment_for_trip/{trip_id}"),
+        bookings_call,
+        return_exceptions=True,
+    )
+    return dep, result
+
+
+# --------------------------
+# Bulk assignment planning
+# --------------------------
+
+# Rows per POST /api/deployments/batch call (one backend transaction each).
+DEPLOYMENT_BATCH_SIZE = 500
+
+
+async def fetch_vehicles():
+    """Vehicles and their seat capacity, from the snapshot cache."""
+    return await SNAPSHOTS.get("vehicles", _load_vehicles)
+
+
+async def _load_vehicles():
+    return await node_get("/api/vehicles", decode=_decode_vehicles)
+
+
+def _decode_vehicles(resp) -> list:
+    return _list_payload(resp, "vehicles", "/api/vehicles")
+
+
+async def fetch_drivers():
+    """Drivers, from the snapshot cache (empty on backends without the route)."""
+    if "drivers" in _BACKEND_UNSUPPORTED:
+        return []
+    try:
+        return await SNAPSHOTS.get("drivers", _load_drivers)
+    except Exception as e:
+        if not _is_not_found(e):
+            raise
+        _mark_unsupported("drivers")
+        return []
+
+
+async def _load_drivers():
+    return await node_get("/api/drivers", decode=_decode_drivers)
+
+
+def _decode_drivers(resp) -> list:
+    return _list_payload(resp, "drivers", "/api/drivers")
+
+
+def _today() -> str:
+    """Today as YYYY-MM-DD in UTC, the same day as the backend's date('now')."""
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def _on_date(trip: TripRecord, scheduled_date: str) -> bool:
+    # trips without a date (the backend's JSON fallback) count as that day's
+    return trip.scheduled_date is None or trip.scheduled_date == scheduled_date
+
+
+def _busy_intervals(
+    trips: TripSnapshot, deployments: list, scheduled_date: str
+) -> Dict[Tuple[str, Any], List[Tuple[int, int]]]:
+    """
+    {("vehicle" | "driver", id): [(start, end), ...]} in minutes of the day,
+    from the deployments of trips on ``scheduled_date``. Trips without a time
+    in their name block nothing.
+    """
+    busy: Dict[Tuple[str, Any], List[Tuple[int, int]]] = defaultdict(list)
+    for d in deployments or []:
+        trip = trips.get(d.get("trip_id") or d.get("tripId"))
+        if trip is None or trip.departure is None or not _on_date(trip, scheduled_date):
+            continue
+        block = (trip.departure, trip.departure + TRIP_BLOCK_MINUTES)
+        if d.get("vehicle_id") is not None:
+            busy[("vehicle", d["vehicle_id"])].append(block)
+        if d.get("driver_id") is not None:
+            busy[("driver", d["driver_id"])].append(block)
+    return busy
+
+
+def _deployed_trip_ids(deployments: list) -> set:
+    out = set()
+    for d in deployments or []:
+        tid = d.get("trip_id") or d.get("tripId")
+        if tid is not None:
+            out.add(int(tid))
+    return out
+
+
+def _overlaps(intervals: Optional[List[Tuple[int, int]]], start: int, end: int) -> bool:
+    return any(s < end and start < e for s, e in intervals or ())
+
+
+def plan_assignments(
+    trips: List[TripRecord],
+    seats: Dict[Any, int],
+    vehicles: list,
+    drivers: list,
+    busy: Dict[Tuple[str, Any], List[Tuple[int, int]]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Assign a vehicle (and a driver, when one is free) to each trip.
+
+    Trips are swept in departure order. Free vehicles are kept sorted by
+    capacity and the smallest one that seats the trip's bookings is taken
+    (best fit), so large vehicles stay available for full trips. A vehicle
+    or driver on a planned trip waits in a heap until TRIP_BLOCK_MINUTES
+    after its departure. An existing deployment (``busy``) keeps its vehicle
+    and driver out of the pools while a trip starting then would overlap it.
+    Unknown capacity counts as 0 seats. O((trips + vehicles + deployments) log n).
+
+    Returns (assignments, unplanned), each a list of dicts in departure order.
+    """
+    free_vehicles = sorted(
+        (int(v.get("capacity") or 0), v["vehicle_id"]) for v in vehicles if v.get("vehicle_id") is not None
+    )
+    capacity_of = {vid: capacity for capacity, vid in free_vehicles}
+    free_drivers = [(i, d["driver_id"]) for i, d in enumerate(drivers) if d.get("driver_id") is not None]
+    driver_order = {did: i for i, did in free_drivers}
+    on_trip: List[Tuple[int, str, Any]] = []  # (free at, kind, id) for planned trips
+
+    # a trip starting at t overlaps an existing block (s, e) when
+    # s - TRIP_BLOCK_MINUTES < t < e; blocked counts those windows per key
+    opening = sorted((s - TRIP_BLOCK_MINUTES, e, key) for key, blocks in busy.items() for s, e in blocks)
+    closing: List[Tuple[int, Tuple[str, Any]]] = []
+    blocked: Dict[Tuple[str, Any], int] = defaultdict(int)
+    # blocked keys taken out of a pool, put back when their last window closes
+    dropped: set = set()
+
+    def release(key):
+        if blocked[key]:
+            dropped.add(key)
+        elif key[0] == "vehicle":
+            bisect.insort(free_vehicles, (capacity_of[key[1]], key[1]))
+        else:
+            heapq.heappush(free_drivers, (driver_order[key[1]], key[1]))
+
+    heapq.heapify(free_drivers)
+    assignments: List[Dict[str, Any]] = []
+    unplanned: List[Dict[str, Any]] = []
+    k = 0
+    for trip in sorted(trips, key=lambda t: (t.departure is None, t.departure or 0)):
+        booked = seats.get(trip.trip_id, 0)
+        item = {"trip_id": trip.trip_id, "display_name": trip.label, "bookings": booked}
+        if trip.departure is None:
+            unplanned.append({**item, "reason": "no departure time in the trip name"})
+            continue
+        start, end = trip.departure, trip.departure + TRIP_BLOCK_MINUTES
+        item["departure"] = _format_minutes(start)
+
+        while k < len(opening) and opening[k][0] < start:
+            _, close_at, key = opening[k]
+            k += 1
+            blocked[key] += 1
+            heapq.heappush(closing, (close_at, key))
+        while closing and closing[0][0] <= start:
+            key = heapq.heappop(closing)[1]
+            blocked[key] -= 1
+            if not blocked[key] and key in dropped:
+                dropped.discard(key)
+                release(key)
+        while on_trip and on_trip[0][0] <= start:
+            _, kind, ident = heapq.heappop(on_trip)
+            release((kind, ident))
+
+        i = bisect.bisect_left(free_vehicles, (booked,))
+        while i < len(free_vehicles) and blocked[("vehicle", free_vehicles[i][1])]:
+            dropped.add(("vehicle", free_vehicles.pop(i)[1]))
+        if i == len(free_vehicles):
+            unplanned.append({**item, "reason": f"no free vehicle with {booked} seat(s)"})
+            continue
+        capacity, vid = free_vehicles.pop(i)
+        heapq.heappush(on_trip, (end, "vehicle", vid))
+
+        did = None
+        while free_drivers:
+            _, candidate = heapq.heappop(free_drivers)
+            if not blocked[("driver", candidate)]:
+                did = candidate
+                heapq.heappush(on_trip, (end, "driver", did))
+                break
+            dropped.add(("driver", candidate))
+
+        assignments.append({**item, "vehicle_id": vid, "capacity": capacity, "driver_id": did})
+    return assignments, unplanned
+
+
+def _describe_assignment(a: Dict[str, Any]) -> str:
+    driver = f", driver {a['driver_id']}" if a.get("driver_id") is not None else ""
+    return f"{a['display_name']} -> vehicle {a['vehicle_id']} ({a['capacity']} seats){driver}"
+
+
+async def _booked_seats(trip_ids: List[Any], scheduled_date: str) -> Dict[Any, int]:
+    """
+    Confirmed bookings per trip of one day: the day's /api/bookings/counts
+    aggregate, with a per-trip count for trips it lacks (or older backends).
+    """
+    counts: Dict[str, int] = {}
+    if "booking_counts" not in _BACKEND_UNSUPPORTED:
+        try:
+            resp = await node_get("/api/bookings/counts", params={"scheduled_date": scheduled_date})
+            counts = {str(k): int(v or 0) for k, v in (resp or {}).items()}
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            _mark_unsupported("booking_counts")
+    missing = [tid for tid in trip_ids if str(tid) not in counts]
+    extra = await asyncio.gather(*(fetch_booking_count(tid, use_aggregate=False) for tid in missing))
+    seats = {tid: counts[str(tid)] for tid in trip_ids if str(tid) in counts}
+    seats.update(zip(missing, extra))
+    return seats
+
+
+async def plan_bulk_assignment(
+    current_page: Optional[str] = None, scheduled_date: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Plan vehicles and drivers for every unassigned trip on ``scheduled_date``
+    (default today) and keep the plan as one pending "bulk_assign" confirmation.
+    """
+    scheduled_date = scheduled_date or _today()
+    try:
+        trips, deployments, vehicles, drivers = await asyncio.gather(
+            fetch_daily_trips(), fetch_deployments(), fetch_vehicles(), fetch_drivers()
+        )
+        deployed = _deployed_trip_ids(deployments)
+        day = [t for t in trips if isinstance(t.trip_id, int) and _on_date(t, scheduled_date)]
+        todo = [t for t in day if t.trip_id not in deployed]
+        seats = await _booked_seats([t.trip_id for t in todo], scheduled_date)
+    except Exception as e:
+        logger.exception("Backend error while planning assignments: %s", e)
+        return {
+            "ok": False,
+            "message": "I couldn't load trips, vehicles or bookings from the backend.",
+        }
+
+    if not day:
+        return {"ok": True, "message": f"There are no trips scheduled on {scheduled_date}.", "assignments": []}
+    if not todo:
+        return {"ok": True, "message": "All trips currently have a vehicle assigned.", "assignments": []}
+
+    start = time.perf_counter()
+    assignments, unplanned = plan_assignments(
+        todo, seats, vehicles, drivers, _busy_intervals(trips, deployments, scheduled_date)
+    )
+    logger.info(
+        "Planned %d of %d unassigned trips in %.1f ms",
+        len(assignments), len(todo), (time.perf_counter() - start) * 1000,
+    )
+
+    lines = []
+    if unplanned:
+        names = ", ".join(f"{u['display_name']} ({u['reason']})" for u in unplanned[:5])
+        more = f", and {len(unplanned) - 5} more" if len(unplanned) > 5 else ""
+        lines.append(f"{len(unplanned)} trip(s) can't be covered: {names}{more}.")
+    if not assignments:
+        return {
+            "ok": False,
+            "message": " ".join(["I couldn't plan any assignment."] + lines),
+            "assignments": [],
+            "unplanned": unplanned,
+        }
+
+    pid = f"p_{int(time.time() * 1000)}_{random.randint(100, 999)}"
+    await PENDING.put(pid, {
+        "action": "bulk_assign",
+        "details": {
+            "assignments": assignments,
+            "scheduled_date": scheduled_date,
+            "requested_by_page": current_page,
+        },
+        "createdAt": time.time(),
+    })
+    preview = "; ".join(_describe_assignment(a) for a in assignments[:10])
+    if len(assignments) > 10:
+        preview += f"; and {len(assignments) - 10} more"
+    lines.insert(0, f"I can cover {len(assignments)} of {len(todo)} unassigned trip(s): {preview}.")
+    lines.append(f"Reply with 'yes' using pendingId: {pid} to apply the plan.")
+    return {
+        "ok": True,
+        "confirmationRequired": True,
+        "pendingId": pid,
+        "message": " ".join(lines),
+        "assignments": assignments,
+        "unplanned": unplanned,
+    }
+
+
+async def create_deployments(rows: List[Dict[str, Any]]) -> Tuple[List[dict], List[Any]]:
+    """
+    Insert deployments through POST /api/deployments/batch, one backend
+    transaction per DEPLOYMENT_BATCH_SIZE rows; the backend skips trips that
+    already have a deployment. Older backends get one POST per row.
+    Returns (created [{trip_id, deployment_id}], skipped trip_ids).
+    """
+    created: List[dict] = []
+    skipped: List[Any] = []
+    if "deployments_batch" not in _BACKEND_UNSUPPORTED:
+        try:
+            for i in range(0, len(rows), DEPLOYMENT_BATCH_SIZE):
+                resp = await node_post(
+                    "/api/deployments/batch",
+                    json_body={"deployments": rows[i:i + DEPLOYMENT_BATCH_SIZE]},
+                ) or {}
+                created.extend(resp.get("created") or [])
+                skipped.extend(resp.get("skipped") or [])
+            return created, skipped
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            _mark_unsupported("deployments_batch")
+
+    for row in rows[len(created) + len(skipped):]:
+        resp = await node_post("/api/deployments", json_body=row) or {}
+        created.append({
+            "trip_id": row["trip_id"],
+            "deployment_id": resp.get("deployment_id") or resp.get("id"),
+        })
+    return created, skipped
+
+
+async def apply_bulk_assignment(
+    assignments: List[Dict[str, Any]], scheduled_date: str
+) -> Dict[str, Any]:
+    """
+    Write a confirmed plan. Deployments are re-read first and items whose
+    trip got a vehicle, or whose vehicle or driver got busy, since planning
+    are skipped.
+    """
+    trips, deployments = await asyncio.gather(fetch_daily_trips(), _load_deployments())
+    deployed = _deployed_trip_ids(deployments)
+    busy = _busy_intervals(trips, deployments, scheduled_date)
+
+    rows, stale = [], []
+    for a in assignments:
+        trip = trips.get(a["trip_id"])
+        start = trip.departure if trip is not None else None
+        end = start + TRIP_BLOCK_MINUTES if start is not None else None
+        if a["trip_id"] in deployed or (start is not None and (
+            _overlaps(busy.get(("vehicle", a["vehicle_id"])), start, end)
+            or _overlaps(busy.get(("driver", a["driver_id"])), start, end)
+        )):
+            stale.append(a["trip_id"])
+            continue
+        rows.append({"trip_id": a["trip_id"], "vehicle_id": a["vehicle_id"], "driver_id": a["driver_id"]})
+
+    created, skipped = await create_deployments(rows) if rows else ([], [])
+    skipped = stale + list(skipped)
+    msg = f"Assigned vehicles to {len(created)} trip(s)."
+    if skipped:
+        msg += f" Skipped {len(skipped)} trip(s) that changed since the plan was made."
+    return {"ok": True, "message": msg, "created": created, "skipped": skipped}
+
+
 # --------------------------
 # Core orchestration
 # --------------------------
 
 
-def perform_consequence_check_and_maybe_execute(
+async def perform_consequence_check_and_maybe_execute(
     parsed_intent,
     image_text: Optional[str] = None,
     pending_id: Optional[str] = None,
@@ -510,7 +2670,8 @@ def perform_consequence_check_and_maybe_execute(
     # 1) Confirmation handling
     if intent == "confirm" and pending_id:
         logger.info("Handling confirm for pending_id=%s", pending_id)
-        p = PENDING.get(pending_id)
+        # claim the pending action; it is put back if execution fails
+        p = await PENDING.take(pending_id)
         if not p:
             logger.info("Pending id not found: %s", pending_id)
             return {"ok": False, "message": "No pending action found."}
@@ -520,9 +2681,8 @@ def perform_consequence_check_and_maybe_execute(
             deployment_id = p["details"]["deployment_id"]
             bookings_count = p["details"].get("bookings", 0)
             try:
-                resp_del = node_delete(f"/api/deployments/{deployment_id}") or {}
+                resp_del = await node_delete(f"/api/deployments/{deployment_id}") or {}
                 # NOTE: bookings are conceptually cancelled in DB by backend logic.
-                del PENDING[pending_id]
                 msg = (
                     f"Removed vehicle (deployment {deployment_id}) from trip {trip_id}. "
                     f"Cancelled {bookings_count} bookings."
@@ -536,6 +2696,22 @@ def perform_consequence_check_and_maybe_execute(
                 }
             except Exception as e:
                 logger.exception("Error executing confirm for pending: %s", e)
+                await PENDING.put(pending_id, p)
+                return {
+                    "ok": False,
+                    "message": f"Failed to execute pending action: {str(e)}",
+                }
+        elif p["action"] == "bulk_assign":
+            try:
+                details = p["details"]
+                result = await apply_bulk_assignment(
+                    details["assignments"], details.get("scheduled_date") or _today()
+                )
+                logger.info("Confirm executed: %s", result["message"])
+                return result
+            except Exception as e:
+                logger.exception("Error applying assignment plan %s: %s", pending_id, e)
+                await PENDING.put(pending_id, p)
                 return {
                     "ok": False,
                     "message": f"Failed to execute pending action: {str(e)}",
@@ -562,8 +2738,7 @@ def perform_consequence_check_and_maybe_execute(
             }
 
         try:
-            trips = fetch_daily_trips()
-            logger.info("Fetched %d trips from Node to search for match.", len(trips))
+            match = await _resolve_trip(parsed_intent, target_text)
         except Exception as e:
             logger.exception("Failed to fetch trips from Node: %s", e)
             return {
@@ -571,8 +2746,6 @@ def perform_consequence_check_and_maybe_execute(
                 "message": "Unable to search trips right now (backend error).",
             }
 
-        match = find_best_trip_match(target_text, trips)
-
         if not match:
             logger.info("No trip matched target_text='%s'", target_text)
             return {
@@ -583,21 +2756,19 @@ def perform_consequence_check_and_maybe_execute(
                 ),
             }
 
-        trip_id = match.get("trip_id") or match.get("id") or match.get("tripId")
-        display_name = match.get("display_name") or match.get("name") or target_text
+        trip_id = match.trip_id
+        display_name = match.display_name or target_text
         logger.info("Resolved trip to id=%s display_name=%s", trip_id, display_name)
 
+        # deployment and bookings lookups run concurrently; the booking count
+        # guards a destructive action, so it bypasses the cached aggregate
+        dep, b = await fetch_trip_lookups(trip_id, bookings="fresh_count")
+
         # find deployment for the trip
         try:
-            dep = node_get(f"/api/helpers/deployment_for_trip/{trip_id}")
-            deployment = None
-            if isinstance(dep, dict):
-                if dep.get("found") and dep.get("deployment"):
-                    deployment = dep["deployment"]
-                elif dep.get("deployment"):
-                    deployment = dep["deployment"]
-            else:
-                deployment = dep
+            if isinstance(dep, Exception):
+                raise dep
+            deployment = _extract_deployment(dep)
 
             if not deployment:
                 logger.info("No deployment found for trip %s", trip_id)
@@ -623,13 +2794,9 @@ def perform_consequence_check_and_maybe_execute(
         # get bookings count
         bookings_count = 0
         try:
-            b = node_get(f"/api/bookings/trip/{trip_id}")
-            if isinstance(b, list):
-                bookings_count = len(b)
-            elif isinstance(b, dict):
-                bookings_count = int(b.get("count", 0))
-            else:
-                bookings_count = int(b or 0)
+            if isinstance(b, Exception):
+                raise b
+            bookings_count = _count_bookings(b)
         except Exception:
             logger.info(
                 "Could not fetch booking count for trip %s; defaulting to 0",
@@ -639,7 +2806,7 @@ def perform_consequence_check_and_maybe_execute(
         # if bookings exist -> create pending confirmation
         if bookings_count and bookings_count > 0:
             pid = f"p_{int(time.time() * 1000)}_{random.randint(100, 999)}"
-            PENDING[pid] = {
+            await PENDING.put(pid, {
                 "action": "remove_vehicle",
                 "details": {
                     "trip_id": trip_id,
@@ -651,7 +2818,7 @@ def perform_consequence_check_and_maybe_execute(
                     "requested_by_page": current_page,
                 },
                 "createdAt": time.time(),
-            }
+            })
             logger.info(
                 "Created pending %s for remove_vehicle on trip %s (bookings=%s)",
                 pid,
@@ -683,7 +2850,7 @@ def perform_consequence_check_and_maybe_execute(
                 trip_id,
                 deployment_id,
             )
-            resp_del = node_delete(f"/api/deployments/{deployment_id}") or {}
+            resp_del = await node_delete(f"/api/deployments/{deployment_id}") or {}
             msg = (
                 f"Removed vehicle (deployment {deployment_id}) from trip {trip_id}. "
                 "Cancelled 0 bookings."
@@ -709,90 +2876,80 @@ def perform_consequence_check_and_maybe_execute(
             target_text = _strip_status_wrappers(target_text).strip()
             logger.info("Trip query on text: %s", target_text)
 
-        try:
-            trips = fetch_daily_trips()
-            logger.info("Fetched %d trips for trip_query.", len(trips))
-        except Exception as e:
-            logger.exception("Failed to fetch trips from Node: %s", e)
-            return {
-                "ok": False,
-                "message": "I couldn't load today's trips from the backend.",
-            }
-
-        if not trips:
-            return {
-                "ok": False,
-                "message": "There are no trips in the system for today.",
-            }
-
-        target_norm = _normalize_name(target_text) if target_text else ""
-        generic_trip_targets = {
-            "",
-            "trip",
-            "trips",
-            "show trips",
-            "show me trips",
-            "show all trips",
-            "list trips",
-            "list all trips",
-        }
-
-        # Generic "show trips" style query
-        if not target_text or target_norm in generic_trip_targets:
-            names = [
-                t.get("display_name")
-                or t.get("name")
-                or f"trip {t.get('trip_id')}"
-                for t in trips[:5]
-            ]
-            return {
-                "ok": True,
-                "message": "I see these trips for today: " + ", ".join(names),
-            }
+        # a follow-up ("how many bookings does it have") reuses the session's trip
+        match = None
+        if parsed_intent.get("context_trip") is not None:
+            match = await _resolve_trip(parsed_intent, target_text)
+        if match is None:
+            try:
+                trips = await fetch_daily_trips()
+                logger.info("Fetched %d trips for trip_query.", len(trips))
+            except Exception as e:
+                logger.exception("Failed to fetch trips from Node: %s", e)
+                return {
+                    "ok": False,
+                    "message": "I couldn't load today's trips from the backend.",
+                }
 
-        # Try to match a specific trip
-        match = find_best_trip_match(target_text, trips)
-        if not match:
-            return {
-                "ok": False,
-                "message": (
-                    f"I couldn't find a trip matching '{target_text}'. "
-                    "Try using the exact display name from the UI, like 'Bulk - 00:01'."
-                ),
+            if not trips:
+                return {
+                    "ok": False,
+                    "message": "There are no trips in the system for today.",
+                }
+
+            target_norm = _normalize_name(target_text) if target_text else ""
+            generic_trip_targets = {
+                "",
+                "trip",
+                "trips",
+                "show trips",
+                "show me trips",
+                "show all trips",
+                "list trips",
+                "list all trips",
             }
 
-        trip_id = match.get("trip_id") or match.get("id") or match.get("tripId")
-        display_name = (
-            match.get("display_name") or match.get("name") or f"Trip {trip_id}"
-        )
-        scheduled_date = match.get("scheduled_date") or match.get("date") or "today"
+            # Generic "show trips" style query
+            if not target_text or target_norm in generic_trip_targets:
+                names = [t.label for t in trips[:5]]
+                return {
+                    "ok": True,
+                    "message": "I see these trips for today: " + ", ".join(names),
+                }
+
+            # Try to match a specific trip
+            match = find_best_trip_match(target_text, trips)
+            if not match:
+                return {
+                    "ok": False,
+                    "message": (
+                        f"I couldn't find a trip matching '{target_text}'. "
+                        "Try using the exact display name from the UI, like 'Bulk - 00:01'."
+                    ),
+                }
+
+        trip_id = match.trip_id
+        display_name = match.label
+        scheduled_date = match.scheduled_date or "today"
+
+        # deployment and bookings lookups run concurrently
+        dep, b = await fetch_trip_lookups(trip_id)
 
         # deployment info
         deployment = None
-        try:
-            dep = node_get(f"/api/helpers/deployment_for_trip/{trip_id}")
-            if isinstance(dep, dict):
-                if dep.get("found") and dep.get("deployment"):
-                    deployment = dep["deployment"]
-                elif dep.get("deployment"):
-                    deployment = dep["deployment"]
-            else:
-                deployment = dep
-        except Exception as e:
-            logger.exception(
-                "Error fetching deployment for trip %s: %s", trip_id, e
+        if isinstance(dep, Exception):
+            logger.error(
+                "Error fetching deployment for trip %s: %s", trip_id, dep
             )
+        else:
+            deployment = _extract_deployment(dep)
 
         # booking count
         bookings_count = 0
         try:
-            b = node_get(f"/api/bookings/trip/{trip_id}")
-            if isinstance(b, list):
-                bookings_count = len(b)
-            elif isinstance(b, dict):
-                bookings_count = int(b.get("count", 0))
-            else:
-                bookings_count = int(b or 0)
+            if isinstance(b, Exception):
+                raise b
+            bookings_count = _count_bookings(b)
         except Exception:
             logger.info(
                 "Could not fetch booking count for trip %s; defaulting to 0",
@@ -837,7 +2994,7 @@ def perform_consequence_check_and_maybe_execute(
             target_text = _strip_status_wrappers(target_text).strip()
             logger.info("Route query on text: %s", target_text)
 
-        routes = fetch_routes()
+        routes = await fetch_routes()
         if not routes:
             return {
                 "ok": False,
@@ -892,23 +3049,13 @@ def perform_consequence_check_and_maybe_execute(
 
         # Find today's trips on this route
         try:
-            trips = fetch_daily_trips()
+            trips = await fetch_daily_trips()
+            trips_for_route = trips.on_route(route_id)
         except Exception as e:
             logger.exception("Failed to fetch trips for route_query: %s", e)
-            trips = []
-
-        def _trip_route_id(t):
-            return str(t.get("route_id") or t.get("routeId") or "")
-
-        route_id_str = str(route_id) if route_id is not None else ""
-        trips_for_route = [t for t in trips if _trip_route_id(t) == route_id_str]
+            trips_for_route = []
 
-        trip_names = [
-            t.get("display_name")
-            or t.get("name")
-            or f"trip {t.get('trip_id')}"
-            for t in trips_for_route
-        ]
+        trip_names = [t.label for t in trips_for_route]
 
         if trip_names:
             msg = (
@@ -926,7 +3073,7 @@ def perform_consequence_check_and_maybe_execute(
             "ok": True,
             "message": msg,
             "route": {"route_id": route_id, "route_name": route_name},
-            "trips": trips_for_route,
+            "trips": [t.to_dict() for t in trips_for_route],
         }
 
     # 5) ASSIGN VEHICLE
@@ -949,7 +3096,7 @@ def perform_consequence_check_and_maybe_execute(
             }
 
         try:
-            trips = fetch_daily_trips()
+            match = await _resolve_trip(parsed_intent, target_text)
         except Exception as e:
             logger.exception("Failed to fetch trips for assign_vehicle: %s", e)
             return {
@@ -957,7 +3104,6 @@ def perform_consequence_check_and_maybe_execute(
                 "message": "Unable to load trips right now (backend error).",
             }
 
-        match = find_best_trip_match(target_text, trips)
         if not match:
             return {
                 "ok": False,
@@ -967,22 +3113,13 @@ def perform_consequence_check_and_maybe_execute(
                 ),
             }
 
-        trip_id = match.get("trip_id") or match.get("id") or match.get("tripId")
-        display_name = (
-            match.get("display_name") or match.get("name") or str(trip_id)
-        )
+        trip_id = match.trip_id
+        display_name = match.display_name or str(trip_id)
 
         # Check if there is already a deployment
         try:
-            dep = node_get(f"/api/helpers/deployment_for_trip/{trip_id}")
-            deployment = None
-            if isinstance(dep, dict):
-                if dep.get("found") and dep.get("deployment"):
-                    deployment = dep["deployment"]
-                elif dep.get("deployment"):
-                    deployment = dep["deployment"]
-            else:
-                deployment = dep
+            dep = await node_get(f"/api/helpers/deployment_for_trip/{trip_id}")
+            deployment = _extract_deployment(dep)
         except Exception as e:
             logger.exception("Failed to fetch deployment for assign_vehicle: %s", e)
             deployment = None
@@ -1023,7 +3160,7 @@ def perform_consequence_check_and_maybe_execute(
             "driver_id": driver_id,
         }
         try:
-            resp = node_post("/api/deployments", json_body=body) or {}
+            resp = await node_post("/api/deployments", json_body=body) or {}
             deployment_id = resp.get("deployment_id") or resp.get("id")
         except Exception as e:
             logger.exception("Failed to create deployment: %s", e)
@@ -1057,7 +3194,7 @@ def perform_consequence_check_and_maybe_execute(
     # 6) LIST TRIPS
     if intent == "list_trips":
         try:
-            trips = fetch_daily_trips()
+            trips = await fetch_daily_trips()
         except Exception as e:
             logger.exception("Failed to fetch trips for list_trips: %s", e)
             return {
@@ -1068,24 +3205,20 @@ def perform_consequence_check_and_maybe_execute(
         if not trips:
             return {"ok": True, "message": "There are no trips scheduled for today."}
 
-        names = [
-            t.get("display_name")
-            or t.get("name")
-            or f"trip {t.get('trip_id')}"
-            for t in trips
-        ]
+        names = [t.label for t in trips[:10]]
         prefix = f"Today I see {len(trips)} trip(s): "
-        msg = prefix + ", ".join(names[:10])
-        if len(names) > 10:
-            msg += f", and {len(names) - 10} more."
+        msg = prefix + ", ".join(names)
+        if len(trips) > 10:
+            msg += f", and {len(trips) - 10} more."
 
-        return {"ok": True, "message": msg, "trips": trips}
+        return {"ok": True, "message": msg, "trips": trips.to_dicts()}
 
     # 7) LIST UNASSIGNED TRIPS
     if intent == "list_unassigned_trips":
         try:
-            trips = fetch_daily_trips()
-            deployments = fetch_deployments()
+            unassigned, total = await fetch_unassigned_trips(_today())
+            # only an empty answer needs the trip list, to tell "no trips" apart
+            trips = unassigned or await fetch_daily_trips()
         except Exception as e:
             logger.exception("Backend error in list_unassigned_trips: %s", e)
             return {
@@ -1096,24 +3229,6 @@ def perform_consequence_check_and_maybe_execute(
         if not trips:
             return {"ok": True, "message": "There are no trips scheduled today."}
 
-        deployed_trip_ids = set()
-        for d in deployments or []:
-            tid = d.get("trip_id") or d.get("tripId")
-            if tid is not None:
-                deployed_trip_ids.add(int(tid))
-
-        unassigned = []
-        for t in trips:
-            tid = t.get("trip_id") or t.get("id") or t.get("tripId")
-            if tid is None:
-                continue
-            try:
-                tid_int = int(tid)
-            except Exception:
-                continue
-            if tid_int not in deployed_trip_ids:
-                unassigned.append(t)
-
         if not unassigned:
             return {
                 "ok": True,
@@ -1128,15 +3243,15 @@ def perform_consequence_check_and_maybe_execute(
             for t in unassigned
         ]
         msg = "Trips without a vehicle: " + ", ".join(names[:10])
-        if len(names) > 10:
-            msg += f", and {len(names) - 10} more."
+        if total > 10:
+            msg += f", and {total - 10} more."
 
         return {"ok": True, "message": msg, "trips": unassigned}
 
     # 8) LIST ROUTES
     if intent == "list_routes":
         try:
-            routes = fetch_routes()
+            routes = await fetch_routes()
         except Exception as e:
             logger.exception("Failed to fetch routes for list_routes: %s", e)
             return {
@@ -1194,7 +3309,7 @@ def perform_consequence_check_and_maybe_execute(
             }
 
         try:
-            trips = fetch_daily_trips()
+            match = await _resolve_trip(parsed_intent, target_text)
         except Exception as e:
             logger.exception("Failed to fetch trips for tripsheet: %s", e)
             return {
@@ -1202,7 +3317,6 @@ def perform_consequence_check_and_maybe_execute(
                 "message": "Unable to load trips right now (backend error).",
             }
 
-        match = find_best_trip_match(target_text, trips)
         if not match:
             return {
                 "ok": False,
@@ -1212,25 +3326,19 @@ def perform_consequence_check_and_maybe_execute(
                 ),
             }
 
-        trip_id = match.get("trip_id") or match.get("id") or match.get("tripId")
-        display_name = (
-            match.get("display_name") or match.get("name") or f"Trip {trip_id}"
-        )
-        scheduled_date = match.get("scheduled_date") or match.get("date") or "today"
+        trip_id = match.trip_id
+        display_name = match.label
+        scheduled_date = match.scheduled_date or "today"
+
+        # deployment and bookings lookups run concurrently
+        dep, b = await fetch_trip_lookups(trip_id, bookings="rows")
 
         # deployment info
         deployment = None
-        try:
-            dep = node_get(f"/api/helpers/deployment_for_trip/{trip_id}")
-            if isinstance(dep, dict):
-                if dep.get("found") and dep.get("deployment"):
-                    deployment = dep["deployment"]
-                elif dep.get("deployment"):
-                    deployment = dep["deployment"]
-            else:
-                deployment = dep
-        except Exception as e:
-            logger.exception("Error fetching deployment for tripsheet %s: %s", trip_id, e)
+        if isinstance(dep, Exception):
+            logger.error("Error fetching deployment for tripsheet %s: %s", trip_id, dep)
+        else:
+            deployment = _extract_deployment(dep)
 
         vehicle_id = deployment.get("vehicle_id") if deployment else None
         driver_id = deployment.get("driver_id") if deployment else None
@@ -1241,7 +3349,8 @@ def perform_consequence_check_and_maybe_execute(
         cancelled = 0  # we only see confirmed via /api/bookings/trip
         bookings_raw = []
         try:
-            b = node_get(f"/api/bookings/trip/{trip_id}")
+            if isinstance(b, Exception):
+                raise b
             if isinstance(b, list):
                 bookings_raw = b
                 total_bookings = len(b)
@@ -1308,7 +3417,110 @@ def perform_consequence_check_and_maybe_execute(
             },
         }
 
-    # 10) greetings / generic queries / fallback
+    # 10) TRIPS DEPARTING IN A TIME WINDOW
+    if intent == "trips_in_window":
+        target_text = parsed_intent.get("target") or ""
+        window = _parse_time_window(target_text) or _parse_time_window(raw_text or "")
+        if window is None:
+            return {
+                "ok": False,
+                "message": (
+                    "I couldn't tell which time window you mean. "
+                    "Try: 'trips between 08:00 and 09:30'."
+                ),
+            }
+
+        try:
+            trips = await fetch_daily_trips()
+        except Exception as e:
+            logger.exception("Failed to fetch trips for trips_in_window: %s", e)
+            return {
+                "ok": False,
+                "message": "I couldn't load today's trips from the backend.",
+            }
+
+        start, end = window
+        start_s, end_s = _format_minutes(start), _format_minutes(end)
+        departing = trips.departing_between(start, end)
+        if not departing:
+            msg = f"No trips depart between {start_s} and {end_s} today."
+        else:
+            msg = (
+                f"{len(departing)} trip(s) depart between {start_s} and {end_s}: "
+                + ", ".join(t.label for t in departing[:10])
+            )
+            if len(departing) > 10:
+                msg += f", and {len(departing) - 10} more."
+
+        return {
+            "ok": True,
+            "message": msg,
+            "window": {"start": start_s, "end": end_s},
+            "trips": [t.to_dict() for t in departing],
+        }
+
+    # 11) NEXT DEPARTURE OF A SERVICE
+    if intent == "next_departure":
+        target_text = _service_name(parsed_intent.get("target") or "")
+        if not target_text:
+            return {
+                "ok": False,
+                "message": (
+                    "Which service do you mean? Try: 'next departure on TechLoop'."
+                ),
+            }
+
+        try:
+            trips = await fetch_daily_trips()
+        except Exception as e:
+            logger.exception("Failed to fetch trips for next_departure: %s", e)
+            return {
+                "ok": False,
+                "message": "I couldn't load today's trips from the backend.",
+            }
+
+        key = None
+        if trips:
+            key = _resolver_for("services", trips, build_service_resolver).best(target_text)
+        if key is None:
+            return {
+                "ok": False,
+                "message": f"I couldn't find a service matching '{target_text}' today.",
+            }
+
+        # "after HH:MM" in the message, otherwise the current local time
+        m = _AFTER_BEFORE_RE.search(raw_text or "")
+        after = None
+        if m and m.group(1).lower() == "after":
+            after = _clock_minutes(*m.groups()[1:])
+        if after is None:
+            now = time.localtime()
+            after = now.tm_hour * 60 + now.tm_min
+
+        service = trips.service_name(key)
+        nxt = trips.next_departure(key, after)
+        if nxt is None:
+            first = trips.first_departure(key)
+            msg = f"There are no more {service} departures today after {_format_minutes(after)}."
+            if first is not None:
+                msg += f" The first one is '{first.label}' at {_format_minutes(first.departure)}."
+            return {"ok": True, "message": msg, "service": service, "trip": None}
+
+        return {
+            "ok": True,
+            "message": (
+                f"The next {service} departure after {_format_minutes(after)} is "
+                f"'{nxt.label}' at {_format_minutes(nxt.departure)} (trip id {nxt.trip_id})."
+            ),
+            "service": service,
+            "trip": nxt.to_dict(),
+        }
+
+    # 12) PLAN VEHICLES FOR EVERY UNASSIGNED TRIP
+    if intent == "plan_assignments":
+        return await plan_bulk_assignment(current_page)
+
+    # 13) greetings / generic queries / fallback
     if parsed_intent and parsed_intent.get("intent") == "greeting":
         return {
             "ok": True,
@@ -1347,115 +3559,535 @@ def perform_consequence_check_and_maybe_execute(
 
 
 # --------------------------
-# FastAPI endpoints
+# Conversation sessions
 # --------------------------
 
 
-@app.post("/ai/agent")
-def ai_agent(req: AgentRequest):
-    text = (req.input or "").strip()
+class AgentSession:
+    """
+    Server-side state of one conversation: the confirmation it is waiting
+    on and the trip/route its last turns resolved. Resolved entities are
+    reused for follow-ups only while younger than SESSION_TTL_S.
+    """
 
-    # Greeting quick path
-    if text.lower() in ("hi", "hello", "hey", "hey movi", "hi movi"):
-        return {
-            "ok": True,
-            "message": (
-                "Hi — I'm Movi. I can help manage trips, routes and vehicles. "
-                "Try: 'Remove the vehicle from Bulk - 00:01', "
-                "'Assign vehicle 1 to Bulk - 00:01', or "
-                "'What is the status of Bulk - 00:01?'."
-            ),
-        }
+    __slots__ = ("pending_id", "trip", "route", "last_kind", "resolved_at", "touched_at")
+
+    def __init__(self):
+        self.pending_id: Optional[str] = None
+        self.trip: Optional[TripRecord] = None
+        self.route: Optional[Dict[str, Any]] = None
+        self.last_kind: Optional[str] = None
+        self.resolved_at = 0.0
+        self.touched_at = time.monotonic()
+
+    def remember(self, kind: str, entity: Any):
+        setattr(self, kind, entity)
+        self.last_kind = kind
+        self.resolved_at = time.monotonic()
+
+    def recent(self) -> Optional[str]:
+        """Kind of the last resolved entity, if it is still fresh."""
+        if self.last_kind and time.monotonic() - self.resolved_at < SESSION_TTL_S:
+            return self.last_kind
+        return None
 
-    # confirmation path
-    if req.pendingId and text.lower() in (
-        "yes",
-        "y",
-        "confirm",
-        "proceed",
-        "ok",
-        "okay",
-        "sure",
-    ):
-        logger.info("Processing confirmation for pendingId=%s", req.pendingId)
-        result = perform_consequence_check_and_maybe_execute(
-            {"intent": "confirm"}, pending_id=req.pendingId
-        )
-        logger.info("Confirmation result: %s", result)
-        return result
+    def finish_turn(self, intent: Optional[str], result: Dict[str, Any]):
+        if result.get("confirmationRequired"):
+            self.pending_id = result.get("pendingId")
+        elif intent != "confirm" or result.get("ok"):
+            # a failed confirmation keeps its pending action for a retry
+            self.pending_id = None
 
-    # parse intent (LLM optional)
-    parsed = None
-    if OPENAI_API_KEY and text:
-        try:
-            prompt = f"""
-You are an assistant for a bus transport operations system.
 
-Extract intent and target_text from this user message.
+class SessionCache:
+    """LRU + idle-TTL registry of sessions keyed by client session id."""
 
-Allowed intents:
-- "remove_vehicle": user wants to unassign/cancel a vehicle or deployment from a trip.
-- "assign_vehicle": user wants to allocate/assign/deploy a vehicle (and optional driver) to a trip.
-- "trip_query": asking about a specific trip or bus service (status, bookings, vehicle, etc.).
-- "route_query": asking about a bus route (stops, direction, trips on that route, etc.).
-- "list_trips": asking to list today's trips.
-- "list_unassigned_trips": asking which trips don't have a vehicle/bus assigned.
-- "list_routes": asking to list the available routes.
-- "tripsheet": asking for a tripsheet / trip summary for a specific trip.
-- "confirm": confirming a pending destructive action (yes, proceed, okay, etc.).
-- "greeting": simple greeting like hi/hello.
-- "unknown": anything else.
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._sessions: "OrderedDict[str, AgentSession]" = OrderedDict()
 
-For intents that relate to a specific trip or route
-("remove_vehicle", "assign_vehicle", "trip_query", "tripsheet"),
-set target_text to the most relevant trip phrase mentioned
-(for example "Bulk - 00:01", "TechLoop - 09:00").
+    def get(self, session_id: str) -> AgentSession:
+        """The live session for ``session_id``, starting a new one if needed."""
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is None or now - session.touched_at >= self.ttl:
+            session = self._sessions[session_id] = AgentSession()
+        session.touched_at = now
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+        return session
 
-For list_trips, list_routes, list_unassigned_trips, target_text can be null.
+    def __len__(self):
+        return len(self._sessions)
 
-Respond ONLY with valid JSON in this shape:
-{{"intent": "<one of the intents above>", "target_text": <string or null>}}
 
-Message: "{text}"
-"""
-            llm_out = call_llm(prompt)
-            parsed_json = json.loads(llm_out) if llm_out else {}
-            parsed = {
-                "intent": parsed_json.get("intent"),
-                "target": parsed_json.get("target_text"),
-            }
-        except Exception as e:
-            logger.warning("LLM parse failed: %s - falling back", e)
-            parsed = fallback_parse_intent(text)
-    else:
-        parsed = fallback_parse_intent(text)
+SESSIONS = SessionCache(SESSION_TTL_S, SESSION_MAX)
+
+# Session of the command being handled (None for session-less requests).
+_current_session: contextvars.ContextVar[Optional[AgentSession]] = contextvars.ContextVar(
+    "current_session", default=None
+)
+
+
+def _attach_session(req: AgentRequest) -> Optional[AgentSession]:
+    """Session named by ``req.sessionId``; a bare "yes" inherits its pending id."""
+    if not req.sessionId:
+        return None
+    session = SESSIONS.get(req.sessionId)
+    if req.pendingId is None:
+        req.pendingId = session.pending_id
+    return session
+
+
+# Intents about one trip; a back-reference in them means the session's trip.
+_TRIP_FOLLOWUP_INTENTS = {"trip_query", "remove_vehicle", "assign_vehicle", "tripsheet", "query"}
+_BACK_REF_RE = re.compile(r"\b(?:it|its|this|that|same)(?:\s+(?:one|trip|route))?\b", re.IGNORECASE)
+_BACK_REF_ONLY_RE = re.compile(
+    r"(?:the\s+)?(?:it|its|this|that|same)(?:\s+(?:one|trip|route))?", re.IGNORECASE
+)
+# Words a follow-up can use without naming a trip, route or service.
+_FOLLOWUP_FILLER = frozenset("""
+    a an the of on in at for from to with is are was does do did has have had
+    it its it's this that same one trip trips route routes bus vehicle driver
+    deployment booking bookings seat seats status how many much what what's
+    whats s which who when show me tell give get generate tripsheet sheet
+    summary remove delete unassign cancel assign allocate deploy now please
+    again also and then current currently assigned running
+""".split())
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _names_target(text: str) -> bool:
+    """Whether ``text`` has a trip time or any word that could name a trip, route or service."""
+    if _TIME_RE.search(text):
+        return True
+    for pattern in (_VEHICLE_ID_RE, _BUS_ID_RE, _DRIVER_ID_RE):
+        text = pattern.sub(" ", text)
+    return any(w not in _FOLLOWUP_FILLER for w in _WORD_RE.findall(text.lower()))
+
+
+def _apply_followup(parsed: Dict[str, Any], session: AgentSession) -> Dict[str, Any]:
+    """
+    Point a follow-up at the session's last trip or route. A command is a
+    follow-up when its target is only a back-reference ("it", "that trip"),
+    or it mentions one and no other word could name a trip, route or
+    service ("that Metro trip" is not a follow-up). "assign vehicle 3" with
+    no target at all also counts.
+    """
+    kind = session.recent()
+    intent = parsed.get("intent")
+    if kind is None or intent not in _TRIP_FOLLOWUP_INTENTS | {"route_query"}:
+        return parsed
+    text = parsed.get("raw_text") or ""
+    target = _strip_status_wrappers(parsed.get("target") or "").strip()
+    names_target = _names_target(text)
+    if intent in ("remove_vehicle", "assign_vehicle") and names_target:
+        # a write never moves off a target its text names
+        return parsed
+    refers = bool(_BACK_REF_ONLY_RE.fullmatch(target)) or (
+        not names_target and (bool(_BACK_REF_RE.search(text)) or intent == "assign_vehicle")
+    )
+    if not refers:
+        return parsed
+
+    if intent == "route_query":
+        # "which route is it on" after a trip, "show that route" after a route
+        if kind == "route":
+            route = session.route
+            route_id = route.get("route_id") or route.get("id") or route.get("routeId")
+        else:
+            route_id = session.trip.route_id
+        if route_id is None:
+            return parsed
+        return {**parsed, "target": str(route_id)}
+
+    if session.trip is None:
+        return parsed
+    if intent == "query":
+        # "how many bookings does it have" -> status of the last trip
+        intent = "trip_query"
+    logger.info("Follow-up %s reuses trip %s", intent, session.trip.trip_id)
+    return {**parsed, "intent": intent, "context_trip": session.trip}
+
+
+# --------------------------
+# FastAPI endpoints
+# --------------------------
+
+
+# Intents that change backend state; in a batch they run one at a time, in order.
+# A compound command may contain writes, so it runs alone too.
+_WRITE_INTENTS = {"confirm", "remove_vehicle", "assign_vehicle", "compound"}
+
+_GREETING_MESSAGE = (
+    "Hi — I'm Movi. I can help manage trips, routes and vehicles. "
+    "Try: 'Remove the vehicle from Bulk - 00:01', "
+    "'Assign vehicle 1 to Bulk - 00:01', or "
+    "'What is the status of Bulk - 00:01?'."
+)
+
+
+async def parse_agent_request(req: AgentRequest) -> Dict[str, Any]:
+    """Turn one request into a parsed intent (including greeting/confirm)."""
+    text = (req.input or "").strip()
+
+    # Greeting quick path
+    if text.lower() in _GREETINGS:
+        return {"intent": "greeting", "raw_text": text}
+
+    # confirmation path
+    if req.pendingId and text.lower() in _CONFIRMATIONS:
+        return {"intent": "confirm", "raw_text": text}
+
+    # compound command: its steps are parsed and run by _run_compound
+    steps = _split_steps(text)
+    if len(steps) > 1:
+        return {"intent": "compound", "steps": steps, "raw_text": text, "source": "rules"}
+
+    # parse intent (LLM optional, see PARSE_MODE)
+    start = time.perf_counter()
+    parsed = await parse_intent(text)
+    source = parsed.get("source")
+    PARSE_SECONDS.observe(time.perf_counter() - start, source or "unknown")
 
     # If still unknown but looks like "Bulk - 00:01" style, treat as trip_query
-    if not parsed or parsed.get("intent") in (None, "unknown"):
+    if parsed.get("intent") in (None, "unknown"):
         if _looks_like_trip_or_route_name(text):
-            parsed = {"intent": "trip_query", "target": text}
-        else:
-            parsed = parsed or {"intent": "unknown", "target": None}
+            parsed = {"intent": "trip_query", "target": text, "source": source}
 
     # Attach raw_text so business logic can re-parse vehicle/driver ids etc.
     parsed["raw_text"] = text
 
     logger.info("Parsed intent: %s", parsed)
+    return parsed
+
+
+def _request_outcome(result: Dict[str, Any]) -> str:
+    if result.get("confirmationRequired"):
+        return "confirmation_required"
+    return "ok" if result.get("ok") else "failed"
+
+
+async def handle_agent_request(
+    req: AgentRequest,
+    parsed: Optional[Dict[str, Any]] = None,
+    session: Optional[AgentSession] = None,
+) -> Dict[str, Any]:
+    """Handle one command; ``session`` (if any) supplies follow-up context."""
+    if session is not None:
+        _current_session.set(session)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await _handle_agent_request(req, parsed)
+        outcome = _request_outcome(result)
+        if session is not None:
+            session.finish_turn(_current_intent.get(), result)
+        return result
+    finally:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start, _current_intent.get(), outcome
+        )
+
+
+async def _handle_agent_request(
+    req: AgentRequest, parsed: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    if parsed is None:
+        parsed = await parse_agent_request(req)
+    session = _current_session.get()
+    if session is not None:
+        parsed = _apply_followup(parsed, session)
+    intent = parsed.get("intent")
+    _current_intent.set(intent or "unknown")
+    emit_progress(
+        "intent",
+        {"intent": intent, "target": parsed.get("target"), "parseSource": parsed.get("source")},
+    )
+
+    if intent == "greeting":
+        return {"ok": True, "message": _GREETING_MESSAGE}
+
+    if intent == "compound":
+        return await _run_compound(req, parsed["steps"], session)
+
+    if intent == "confirm":
+        logger.info("Processing confirmation for pendingId=%s", req.pendingId)
+        result = await perform_consequence_check_and_maybe_execute(
+            {"intent": "confirm"}, pending_id=req.pendingId
+        )
+        logger.info("Confirmation result: %s", result)
+        return result
 
-    result = perform_consequence_check_and_maybe_execute(
+    result = await perform_consequence_check_and_maybe_execute(
         parsed,
         image_text=req.imageText,
         pending_id=req.pendingId,
         current_page=req.currentPage,
     )
+    result["parseSource"] = parsed.get("source")
     logger.info("Action result: %s", result)
     return result
 
 
+async def _run_compound(
+    req: AgentRequest, steps: List[str], session: Optional[AgentSession]
+) -> Dict[str, Any]:
+    """
+    Run each step of a compound command as its own request through the batch
+    plan (reads concurrently, writes alone and in order, one snapshot read).
+    Destructive steps still stop at their booking check; their confirmation
+    is returned for the whole command and later write steps are not run.
+    """
+    steps = steps[:AGENT_BATCH_MAX]
+    emit_progress("plan", {"steps": steps})
+    # steps share a session, so "... and assign vehicle 4 to it" means the
+    # trip an earlier step resolved
+    session = session or AgentSession()
+    reqs = [AgentRequest(input=step, currentPage=req.currentPage) for step in steps]
+    parsed_items = await asyncio.gather(*(parse_agent_request(r) for r in reqs))
+    results = await _execute_plan(
+        reqs, parsed_items, [session] * len(reqs), hold_writes_after_pending=True
+    )
+
+    lines = [f"{i}. {r.get('message', '')}" for i, r in enumerate(results, 1)]
+    # later writes are held, so at most one step waits for confirmation
+    pending = [i for i, r in enumerate(results) if r.get("confirmationRequired")]
+    combined: Dict[str, Any] = {
+        "ok": all(r.get("ok") or r.get("deferred") for r in results),
+        "message": "\n".join(lines),
+        "steps": [{"input": step, **r} for step, r in zip(steps, results)],
+    }
+    if pending:
+        combined["confirmationRequired"] = True
+        combined["pendingId"] = results[pending[0]].get("pendingId")
+    return combined
+
+
+async def _execute_plan(
+    reqs: List[AgentRequest],
+    parsed_items: List[Dict[str, Any]],
+    sessions: List[Optional[AgentSession]],
+    hold_writes_after_pending: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Run parsed commands group by group (see _batch_groups). Every item
+    shares one read of each snapshot; writes refresh what they touch. With
+    ``hold_writes_after_pending``, writes after an item that is waiting for
+    confirmation are not run (they may depend on it).
+    """
+    if _snapshot_scope.get() is None:
+        _snapshot_scope.set({})
+    results: List[Optional[Dict[str, Any]]] = [None] * len(reqs)
+    waiting_on: Optional[int] = None
+    for group in _batch_groups(parsed_items):
+        if waiting_on is not None and parsed_items[group[0]].get("intent") in _WRITE_INTENTS:
+            results[group[0]] = {
+                "ok": False,
+                "deferred": True,
+                "message": (
+                    f"Not run: step {waiting_on + 1} is waiting for confirmation. "
+                    "Send this command again once it is confirmed."
+                ),
+            }
+            continue
+        done = await asyncio.gather(
+            *(_run_batch_item(reqs[i], parsed_items[i], sessions[i]) for i in group)
+        )
+        for i, result in zip(group, done):
+            results[i] = result
+            if hold_writes_after_pending and waiting_on is None and result.get("confirmationRequired"):
+                waiting_on = i
+    return results
+
+
+async def _run_batch_item(
+    req: AgentRequest, parsed: Dict[str, Any], session: Optional[AgentSession]
+) -> Dict[str, Any]:
+    # each item gets its own deadline; runs in its own task context
+    _request_deadline.set(time.monotonic() + REQUEST_DEADLINE_S)
+    try:
+        return await handle_agent_request(req, parsed, session)
+    except Exception as e:
+        logger.exception("Batch item failed: %s", e)
+        return {"ok": False, "message": f"Failed to process command: {e}"}
+
+
+def _batch_groups(parsed_items: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Split batch indices into groups run one after another: runs of read-only
+    items (at most AGENT_BATCH_CONCURRENCY each) and single write items.
+    """
+    groups: List[List[int]] = []
+    reads: List[int] = []
+    for i, parsed in enumerate(parsed_items):
+        if parsed.get("intent") in _WRITE_INTENTS:
+            if reads:
+                groups.append(reads)
+                reads = []
+            groups.append([i])
+            continue
+        reads.append(i)
+        if len(reads) >= AGENT_BATCH_CONCURRENCY:
+            groups.append(reads)
+            reads = []
+    if reads:
+        groups.append(reads)
+    return groups
+
+
+@app.post("/ai/agent")
+async def ai_agent(req: AgentRequest):
+    _request_deadline.set(time.monotonic() + REQUEST_DEADLINE_S)
+    return await handle_agent_request(req, session=_attach_session(req))
+
+
+def _run_with_progress(req: AgentRequest, session: Optional[AgentSession]) -> asyncio.Queue:
+    """
+    Handle ``req`` in a background task (it runs to completion even if the
+    client goes away mid-write) and return a queue of its ``(event, data)``
+    progress events, ending with ``result`` or ``error`` and then None.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        _request_deadline.set(time.monotonic() + REQUEST_DEADLINE_S)
+        _progress.set(lambda event, data: events.put_nowait((event, data)))
+        try:
+            events.put_nowait(("result", await handle_agent_request(req, session=session)))
+        except Exception as e:
+            logger.exception("Agent request failed: %s", e)
+            events.put_nowait(("error", {"ok": False, "message": f"Failed to process command: {e}"}))
+        finally:
+            events.put_nowait(None)
+
+    spawn_background(run())
+    return events
+
+
+@app.post("/ai/agent/stream")
+async def ai_agent_stream(req: AgentRequest):
+    """
+    /ai/agent as Server-Sent Events: ``intent`` once the command is parsed,
+    ``trip`` / ``route`` once the target is resolved, then ``result`` (the
+    /ai/agent response body) or ``error``. Stages that do not apply to an
+    intent send no event.
+    """
+    events = _run_with_progress(req, _attach_session(req))
+
+    async def body():
+        while True:
+            item = await events.get()
+            if item is None:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ai/ws")
+async def ai_ws(ws: WebSocket):
+    """
+    One conversation per connection. Each client frame is an /ai/agent
+    request body; the server answers with ``{"event", "data"}`` frames: the
+    same progress events as /ai/agent/stream, then ``result`` or ``error``.
+    Turns run one at a time. The connection has its own session (or the
+    one named by sessionId), so a plain "yes" needs no pendingId and
+    follow-ups can refer to the last trip.
+    """
+    await ws.accept()
+    connection_session = AgentSession()
+    try:
+        while True:
+            try:
+                req = AgentRequest(**await ws.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                await ws.send_json({"event": "error", "data": {"ok": False, "message": f"Bad request: {e}"}})
+                continue
+            session = _attach_session(req) or connection_session
+            if req.pendingId is None:
+                req.pendingId = session.pending_id
+            events = _run_with_progress(req, session)
+            while (item := await events.get()) is not None:
+                event, data = item
+                await ws.send_text(json.dumps({"event": event, "data": jsonable_encoder(data)}))
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/ai/assignments/plan")
+async def ai_assignments_plan(
+    currentPage: Optional[str] = None, scheduled_date: Optional[str] = None
+):
+    """
+    Plan vehicles and drivers for every unassigned trip on scheduled_date
+    (YYYY-MM-DD, default today; the plan_assignments intent without
+    parsing). Confirm the returned pendingId through /ai/agent to apply it.
+    """
+    _request_deadline.set(time.monotonic() + REQUEST_DEADLINE_S)
+    return await plan_bulk_assignment(currentPage, scheduled_date)
+
+
+@app.post("/ai/agent/batch")
+async def ai_agent_batch(reqs: List[AgentRequest]):
+    """
+    Run many agent commands in one call. All items are parsed up front and
+    share one read of each snapshot. Read-only items run concurrently; writes
+    run alone, in request order, and refresh the snapshots they touch.
+    """
+    if len(reqs) > AGENT_BATCH_MAX:
+        return {
+            "ok": False,
+            "message": f"Batch too large ({len(reqs)} items, max {AGENT_BATCH_MAX}).",
+        }
+
+    sessions = [_attach_session(r) for r in reqs]
+    parsed_items = await asyncio.gather(*(parse_agent_request(r) for r in reqs))
+    results = await _execute_plan(reqs, parsed_items, sessions)
+    return {"ok": True, "count": len(results), "results": results}
+
+
+def _coalesced_gets() -> float:
+    return sum(v for labels, v in BACKEND_GETS._values.items() if labels[1] == "yes")
+
+
+@app.get("/ai/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms in Prometheus text format."""
+    lines: List[str] = []
+    for hist in METRICS:
+        lines.extend(hist.render())
+    return PlainTextResponse(
+        "\n".join(lines) + "\n", media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/ai/ready")
+async def ready():
+    """Readiness probe: 503 until today's trips can be answered from memory."""
+    status = WARM_START.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 @app.get("/ai/health")
-def health():
+async def health():
     return {
         "ok": True,
         "node_backend": NODE_BACKEND,
         "openai": bool(OPENAI_API_KEY),
+        "parseMode": PARSE_MODE,
+        "parseCache": PARSE_CACHE.stats(),
+        "pending": {"store": PENDING_STORE, "size": len(PENDING)},
+        "sessions": len(SESSIONS),
+        "backendGets": {
+            "issued": int(BACKEND_GETS.total() - _coalesced_gets()),
+            "coalesced": int(_coalesced_gets()),
+        },
     }
@@ -0,0 +1,202 @@
+"""
+End-to-end /ai/agent latency and throughput against the fake backend.
+
+Usage (from ai_agent/):
+    python benchmarks/bench_agent.py
+    python benchmarks/bench_agent.py --trips 100 10000 1000000 --requests 2000 --latency-ms 2
+    python benchmarks/bench_agent.py --json > run.json
+
+For each dataset size the agent app is driven in-process (httpx ASGI
+transport, no sockets) with a mixed intent workload; its Node client talks to
+fake_backend.py the same way. The rule parser is used (no LLM), and the
+dataset and workload are derived from --seed, so runs are comparable. The
+report gives the cold first request, then count, ok rate, p50/p95/p99 latency
+and throughput per intent and overall.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+# deterministic, network-free agent configuration (set before importing app)
+os.environ["OPENAI_API_KEY"] = ""
+os.environ["PARSE_MODE"] = "rules"
+os.environ["PARSE_CACHE_FILE"] = ""
+os.environ["PENDING_STORE"] = "memory"
+os.environ["NODE_BACKEND"] = "http://fake-backend"
+
+import httpx  # noqa: E402
+
+import app as agent  # noqa: E402
+from fake_backend import Dataset, create_app  # noqa: E402
+
+# (intent, weight, message template)
+WORKLOAD = (
+    ("trip_query", 30, "Status of {trip}"),
+    ("tripsheet", 10, "Generate tripsheet for {trip}"),
+    ("route_query", 10, "status of route {route}"),
+    ("assign_vehicle", 10, "Assign vehicle {vehicle} to {trip}"),
+    ("remove_vehicle", 10, "Remove vehicle from {trip}"),
+    ("list_trips", 10, "show all trips"),
+    ("list_routes", 10, "list routes"),
+    ("list_unassigned_trips", 10, "Which trips have no vehicle?"),
+)
+
+
+def make_workload(dataset: Dataset, n: int, rng: random.Random):
+    intents = [w[0] for w in WORKLOAD]
+    weights = [w[1] for w in WORKLOAD]
+    templates = {w[0]: w[2] for w in WORKLOAD}
+    requests = []
+    for intent in rng.choices(intents, weights, k=n):
+        text = templates[intent].format(
+            trip=rng.choice(dataset.trips)["display_name"],
+            route=rng.choice(dataset.routes)["route_display_name"],
+            vehicle=rng.randrange(1, dataset.n_vehicles + 1),
+        )
+        requests.append((intent, text))
+    return requests
+
+
+def reset_agent(backend_app):
+    """Point the agent at a fresh fake backend with empty caches."""
+    agent.SNAPSHOTS = agent.SnapshotCache(agent.SNAPSHOT_TTL_S, agent.SNAPSHOT_STALE_S)
+    agent._BACKEND_UNSUPPORTED.clear()
+    agent._INFLIGHT_GETS.clear()
+    # fake ETags restart at v-<key>.0 per Dataset; a kept ETag would 304 into
+    # the previous size's snapshot
+    agent._ETAG_CACHE.clear()
+    agent._RESOLVERS.clear()
+    agent._node_client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=backend_app),
+        base_url=agent.NODE_BACKEND,
+        timeout=agent.NODE_TIMEOUT_S,
+    )
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, oks, wall: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "ok_rate": round(sum(oks) / len(oks), 4) if oks else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "throughput_rps": round(len(ordered) / wall, 1) if wall else 0.0,
+    }
+
+
+async def run_size(n_trips: int, args) -> dict:
+    dataset = Dataset(n_trips, seed=args.seed)
+    reset_agent(create_app(dataset, latency_ms=args.latency_ms, seed=args.seed))
+    rng = random.Random(args.seed)
+    workload = make_workload(dataset, args.warmup + args.requests, rng)
+
+    transport = httpx.ASGITransport(app=agent.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://agent",
+                                 timeout=None) as client:
+
+        async def send(text: str):
+            start = time.perf_counter()
+            r = await client.post("/ai/agent", json={"input": text})
+            body = r.json()
+            ok = r.status_code == 200 and bool(body.get("ok"))
+            return time.perf_counter() - start, ok
+
+        cold, _ = await send(f"Status of {dataset.trips[0]['display_name']}")
+        for _, text in workload[:args.warmup]:
+            await send(text)
+
+        timed = workload[args.warmup:]
+        results = [None] * len(timed)
+        next_index = iter(range(len(timed)))
+
+        async def worker():
+            for i in next_index:
+                results[i] = await send(timed[i][1])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+
+    await agent._node_client.aclose()
+
+    per_intent = {}
+    for (intent, _), (latency, ok) in zip(timed, results):
+        lat, oks = per_intent.setdefault(intent, ([], []))
+        lat.append(latency)
+        oks.append(ok)
+    return {
+        "trips": n_trips,
+        "cold_ms": round(cold * 1000, 3),
+        "total": summarize([r[0] for r in results], [r[1] for r in results], wall),
+        "intents": {
+            intent: summarize(lat, oks, wall)
+            for intent, (lat, oks) in sorted(per_intent.items())
+        },
+    }
+
+
+def print_report(report: dict):
+    cols = ("count", "ok_rate", "p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+    for run in report["results"]:
+        print(f"\n== {run['trips']} trips (cold first request {run['cold_ms']:.1f} ms)")
+        print(f"{'intent':<24}" + "".join(f"{c:>15}" for c in cols))
+        rows = list(run["intents"].items()) + [("TOTAL", run["total"])]
+        for intent, stats in rows:
+            print(f"{intent:<24}" + "".join(f"{stats[c]:>15}" for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trips", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=1.0,
+                        help="injected fake-backend latency per call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    async def run_all():
+        return [await run_size(n, args) for n in args.trips]
+
+    report = {
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "seed": args.seed,
+            "snapshot_ttl_s": agent.SNAPSHOT_TTL_S,
+        },
+        "results": asyncio.run(run_all()),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Rule-parser (fallback_parse_intent) golden check and micro-benchmark.
+
+Usage (from ai_agent/):
+    python benchmarks/bench_intent_parser.py
+    python benchmarks/bench_intent_parser.py --rounds 500
+
+Every phrase in intent_corpus.json must parse to its recorded intent and
+target; any mismatch is printed and the script exits with status 1 before
+timing. Cases with a "followup" flag are also run through _apply_followup
+with a session that just resolved a trip, and must (or must not) reuse it;
+cases with "steps" must split (_split_steps) into exactly those commands.
+The benchmark then reports parses per second over the corpus.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from app import (  # noqa: E402
+    AgentSession, TripRecord, _apply_followup, _split_steps, fallback_parse_intent,
+)
+
+CORPUS = os.path.join(HERE, "intent_corpus.json")
+
+
+def check_golden(corpus) -> int:
+    failures = 0
+    for case in corpus:
+        got = fallback_parse_intent(case["text"])
+        expected = {"intent": case["intent"], "target": case["target"]}
+        if got != expected:
+            failures += 1
+            print(f"MISMATCH {case['text']!r}: expected {expected}, got {got}")
+        elif "followup" in case:
+            session = AgentSession()
+            session.remember("trip", TripRecord(1, 1, "Valley 0 - 00:02", None, None))
+            reused = "context_trip" in _apply_followup({**got, "raw_text": case["text"]}, session)
+            if reused != case["followup"]:
+                failures += 1
+                print(f"MISMATCH {case['text']!r}: expected followup={case['followup']}, got {reused}")
+        if "steps" in case and _split_steps(case["text"]) != case["steps"]:
+            failures += 1
+            print(f"MISMATCH {case['text']!r}: expected steps {case['steps']}, "
+                  f"got {_split_steps(case['text'])}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=300)
+    args = parser.parse_args()
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    failures = check_golden(corpus)
+    if failures:
+        print(f"{failures}/{len(corpus)} golden cases failed")
+        sys.exit(1)
+    print(f"golden corpus: {len(corpus)} cases OK")
+
+    texts = [case["text"] for case in corpus]
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in texts:
+            fallback_parse_intent(text)
+    elapsed = time.perf_counter() - start
+    parses = args.rounds * len(texts)
+    print(f"{parses} parses in {elapsed:.3f}s -> {parses / elapsed:,.0f} parses/s")
+
+
+if __name__ == "__main__":
+    main()
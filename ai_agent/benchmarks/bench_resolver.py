@@ -0,0 +1,134 @@
+"""
+Trip-name lookup latency: linear difflib scan vs. the prebuilt NameResolver.
+
+Usage (from ai_agent/):
+    python benchmarks/bench_resolver.py
+    python benchmarks/bench_resolver.py --sizes 100 1000 10000 100000 --queries 200
+
+For each corpus size it reports index build time and mean / p95 lookup
+latency for a fixed mix of exact, substring, typo and miss queries, plus how
+often the indexed result agrees with the linear reference.
+"""
+
+import argparse
+import difflib
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import NameResolver, _normalize_name  # noqa: E402
+
+PREFIXES = [
+    "Bulk", "Path", "TechLoop", "Groone", "AVX", "NoShow - BTS", "Airport",
+    "Metro", "Campus", "Harbor", "Ridge", "Valley", "Central", "Northgate",
+]
+
+
+def make_names(n: int, rng: random.Random):
+    names = []
+    for i in range(n):
+        prefix = rng.choice(PREFIXES)
+        names.append(f"{prefix} {i // 1440} - {(i // 60) % 24:02d}:{i % 60:02d}")
+    return names
+
+
+def linear_best(target_text: str, names: list):
+    """The pre-index algorithm: exact -> substring scan -> difflib over all."""
+    target_norm = _normalize_name(target_text)
+    candidates = {}
+    for name in names:
+        n = _normalize_name(name)
+        if n:
+            candidates[n] = name
+    if target_norm in candidates:
+        return candidates[target_norm]
+    for n, name in candidates.items():
+        if target_norm in n or n in target_norm:
+            return name
+    close = difflib.get_close_matches(target_norm, list(candidates), n=1, cutoff=0.6)
+    return candidates[close[0]] if close else None
+
+
+def typo(s: str, rng: random.Random) -> str:
+    i = rng.randrange(len(s))
+    return s[:i] + s[i + 1:]
+
+
+def make_queries(names: list, count: int, rng: random.Random):
+    queries = []
+    for i in range(count):
+        name = rng.choice(names)
+        kind = i % 4
+        if kind == 0:
+            queries.append(name)
+        elif kind == 1:
+            queries.append(name.split(" - ")[0] + " - " + name.split(" - ")[-1])
+        elif kind == 2:
+            queries.append(typo(name, rng))
+        else:
+            queries.append(f"zz {rng.randint(0, 10**6)} qq")
+    return queries
+
+
+def time_lookups(fn, queries):
+    samples = []
+    results = []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(fn(q))
+        samples.append(time.perf_counter() - t0)
+    return samples, results
+
+
+def fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1000:9.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--linear-max-queries",
+        type=int,
+        default=20,
+        help="cap on linear-scan queries per size (it is slow at 100k)",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(
+        f"{'names':>8} {'build ms':>9} {'idx mean':>9} {'idx p95':>9} "
+        f"{'lin mean':>9} {'lin p95':>9} {'speedup':>8} {'agree':>6}"
+    )
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        names = make_names(size, rng)
+        queries = make_queries(names, args.queries, rng)
+
+        t0 = time.perf_counter()
+        resolver = NameResolver((_normalize_name(n), n) for n in names)
+        build = time.perf_counter() - t0
+
+        idx_samples, idx_results = time_lookups(resolver.best, queries)
+
+        lin_queries = queries[: args.linear_max_queries]
+        lin_samples, lin_results = time_lookups(lambda q: linear_best(q, names), lin_queries)
+        agree = sum(a == b for a, b in zip(idx_results, lin_results)) / len(lin_results)
+
+        idx_mean = statistics.mean(idx_samples)
+        lin_mean = statistics.mean(lin_samples)
+        print(
+            f"{size:>8} {fmt_ms(build)} {fmt_ms(idx_mean)} "
+            f"{fmt_ms(statistics.quantiles(idx_samples, n=20)[-1])} "
+            f"{fmt_ms(lin_mean)} {fmt_ms(statistics.quantiles(lin_samples, n=20)[-1])} "
+            f"{lin_mean / idx_mean:7.1f}x {agree:6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
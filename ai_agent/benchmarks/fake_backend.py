@@ -0,0 +1,305 @@
+"""
+In-process stand-in for the Node/Express backend, for benchmarks.
+
+Serves every endpoint the agent calls from generated in-memory data, with
+optional injected latency and version ETags on the list endpoints, so agent
+performance can be measured without Express + SQLite. Unlike the real
+/api/daily_trips (capped at 1000 rows) it returns the whole dataset, so the
+agent can be exercised at 100..1M trips.
+
+Usage (from ai_agent/):
+    # standalone, for a separately running agent (NODE_BACKEND=http://127.0.0.1:5055)
+    python benchmarks/fake_backend.py --trips 10000 --latency-ms 2
+
+    # in-process, as bench_agent.py does
+    from fake_backend import Dataset, create_app
+    backend = create_app(Dataset(10000), latency_ms=2)
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request, Response
+
+PREFIXES = [
+    "Bulk", "Path", "TechLoop", "Groone", "AVX", "NoShow - BTS", "Airport",
+    "Metro", "Campus", "Harbor", "Ridge", "Valley", "Central", "Northgate",
+]
+# every generated trip runs today (UTC), like the backend's date('now')
+SCHEDULED_DATE = time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def _hhmm(minute: int) -> str:
+    return f"{(minute // 60) % 24:02d}:{minute % 60:02d}"
+
+
+class Dataset:
+    """
+    Generated trips, routes, deployments, booking counts, vehicles and
+    drivers. Everything is derived from ``seed``, so two datasets of the same
+    size are identical.
+    """
+
+    def __init__(self, n_trips: int, seed: int = 0, assigned_ratio: float = 0.9,
+                 max_bookings: int = 40):
+        rng = random.Random(seed)
+        n_routes = max(10, n_trips // 20)
+        n_vehicles = max(10, n_trips // 2)
+
+        self.routes: List[dict] = []
+        for i in range(n_routes):
+            shift = _hhmm(rng.randrange(1440))
+            self.routes.append({
+                "route_id": i + 1,
+                "path_id": i // 4 + 1,
+                "route_display_name": f"Path-{i + 1} - {shift}",
+                "shift_time": shift,
+                "direction": "UP" if i % 2 == 0 else "DOWN",
+                "start_point": f"Stop {rng.randrange(1, 500)}",
+                "end_point": f"Stop {rng.randrange(1, 500)}",
+                "status": "active",
+                "path_name": f"Path-{i // 4 + 1}",
+            })
+
+        self.trips: List[dict] = []
+        self.booking_counts: Dict[int, int] = {}
+        self.deployments: Dict[int, dict] = {}  # trip_id -> deployment
+        for i in range(n_trips):
+            trip_id = i + 1
+            prefix = rng.choice(PREFIXES)
+            self.trips.append({
+                "trip_id": trip_id,
+                "route_id": rng.randrange(1, n_routes + 1),
+                "display_name": f"{prefix} {i // 1440} - {_hhmm(i)}",
+                "scheduled_date": SCHEDULED_DATE,
+                "live_status": "scheduled",
+            })
+            self.booking_counts[trip_id] = rng.randrange(max_bookings + 1)
+            if rng.random() < assigned_ratio:
+                self.deployments[trip_id] = {
+                    "deployment_id": trip_id,
+                    "trip_id": trip_id,
+                    "vehicle_id": rng.randrange(1, n_vehicles + 1),
+                    "driver_id": rng.randrange(1, n_vehicles + 1),
+                }
+        self.trip_ids = {t["trip_id"] for t in self.trips}
+        self.n_vehicles = n_vehicles
+        # own generator, so adding these left the data above unchanged
+        fleet_rng = random.Random(seed + 1)
+        self.vehicles = [
+            {
+                "vehicle_id": v,
+                "license_plate": f"KA-{v:06d}",
+                "type": "Cab" if capacity <= 4 else "Bus",
+                "capacity": capacity,
+            }
+            for v, capacity in (
+                (v, fleet_rng.choice((4, 12, 20, 40, 50))) for v in range(1, n_vehicles + 1)
+            )
+        ]
+        self.drivers = [
+            {"driver_id": d, "name": f"Driver {d}", "phone_number": f"+91-{9000000000 + d}"}
+            for d in range(1, n_vehicles + 1)
+        ]
+        self._next_deployment_id = n_trips + 1
+        self._json_cache: Dict[str, bytes] = {}
+        # change counters behind the list ETags, like table_versions in db.js
+        self.versions: Dict[str, int] = {"trips": 0, "routes": 0, "deployments": 0}
+        self._unassigned: Optional[List[dict]] = None
+
+    def add_deployment(self, trip_id: int, vehicle_id, driver_id) -> int:
+        deployment_id = self._next_deployment_id
+        self._next_deployment_id += 1
+        self.deployments[trip_id] = {
+            "deployment_id": deployment_id,
+            "trip_id": trip_id,
+            "vehicle_id": vehicle_id,
+            "driver_id": driver_id,
+        }
+        self._changed()
+        return deployment_id
+
+    def delete_deployment(self, deployment_id: int) -> int:
+        for trip_id, dep in self.deployments.items():
+            if dep["deployment_id"] == deployment_id:
+                del self.deployments[trip_id]
+                self._changed()
+                return 1
+        return 0
+
+    def unassigned(self) -> List[dict]:
+        if self._unassigned is None:
+            self._unassigned = [
+                t for t in self.trips if t["trip_id"] not in self.deployments
+            ]
+        return self._unassigned
+
+    def cached_json(self, key: str, build) -> bytes:
+        """Serialized list endpoints, rebuilt only after a write."""
+        body = self._json_cache.get(key)
+        if body is None:
+            body = self._json_cache[key] = json.dumps(build()).encode()
+        return body
+
+    def _changed(self):
+        self.versions["deployments"] += 1
+        self._json_cache.pop("deployments", None)
+        self._unassigned = None
+
+
+def create_app(dataset: Dataset, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+               seed: int = 0) -> FastAPI:
+    """Build the fake backend. Each request sleeps latency_ms +- jitter_ms."""
+    app = FastAPI(title="Movi fake backend")
+    rng = random.Random(seed)
+
+    async def delay():
+        ms = latency_ms + (rng.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+    def json_bytes(body: bytes, status_code: int = 200) -> Response:
+        return Response(content=body, status_code=status_code, media_type="application/json")
+
+    def versioned(request: Request, key: str, build) -> Response:
+        tag = f'W/"v-{key}.{dataset.versions[key]}"'
+        if request.headers.get("if-none-match") == tag:
+            return Response(status_code=304, headers={"ETag": tag})
+        response = json_bytes(dataset.cached_json(key, build))
+        response.headers["ETag"] = tag
+        return response
+
+    @app.get("/api/daily_trips")
+    async def daily_trips(request: Request):
+        await delay()
+        return versioned(request, "trips", lambda: dataset.trips)
+
+    @app.get("/api/routes")
+    async def routes(request: Request):
+        await delay()
+        return versioned(request, "routes", lambda: dataset.routes)
+
+    @app.get("/api/deployments")
+    async def deployments(request: Request):
+        await delay()
+        return versioned(request, "deployments", lambda: list(dataset.deployments.values()))
+
+    @app.post("/api/deployments", status_code=201)
+    async def create_deployment(request: Request):
+        await delay()
+        body = await request.json()
+        trip_id = int(body.get("trip_id"))
+        deployment_id = dataset.add_deployment(
+            trip_id, body.get("vehicle_id"), body.get("driver_id")
+        )
+        return {"deployment_id": deployment_id}
+
+    @app.post("/api/deployments/batch", status_code=201)
+    async def create_deployments(request: Request):
+        await delay()
+        created, skipped = [], []
+        for row in (await request.json()).get("deployments") or []:
+            trip_id = int(row.get("trip_id"))
+            if trip_id in dataset.deployments:
+                skipped.append(trip_id)
+                continue
+            deployment_id = dataset.add_deployment(
+                trip_id, row.get("vehicle_id"), row.get("driver_id")
+            )
+            created.append({"trip_id": trip_id, "deployment_id": deployment_id})
+        return {"created": created, "skipped": skipped}
+
+    @app.get("/api/vehicles")
+    async def vehicles():
+        await delay()
+        return dataset.vehicles
+
+    @app.get("/api/drivers")
+    async def drivers():
+        await delay()
+        return dataset.drivers
+
+    @app.delete("/api/deployments/{deployment_id}")
+    async def delete_deployment(deployment_id: int):
+        await delay()
+        return {"deleted": dataset.delete_deployment(deployment_id)}
+
+    @app.get("/api/helpers/deployment_for_trip/{trip_id}")
+    async def deployment_for_trip(trip_id: int):
+        await delay()
+        dep = dataset.deployments.get(trip_id)
+        if dep is None:
+            return {"found": False}
+        return {
+            "found": True,
+            "deployment": {k: dep[k] for k in ("deployment_id", "vehicle_id", "driver_id")},
+        }
+
+    @app.get("/api/helpers/unassigned_trips")
+    async def unassigned_trips(scheduled_date: Optional[str] = None,
+                               limit: int = 100, offset: int = 0):
+        await delay()
+        limit = min(max(limit, 1), 1000)
+        offset = max(offset, 0)
+        rows = dataset.unassigned()
+        if scheduled_date and scheduled_date != SCHEDULED_DATE:
+            rows = []
+        return {
+            "trips": rows[offset:offset + limit],
+            "total": len(rows),
+            "limit": limit,
+            "offset": offset,
+        }
+
+    @app.get("/api/bookings/trip/{trip_id}")
+    async def bookings_for_trip(trip_id: int):
+        await delay()
+        return [
+            {
+                "booking_id": trip_id * 1000 + k,
+                "trip_id": trip_id,
+                "passenger_name": f"Passenger {k}",
+                "status": "confirmed",
+            }
+            for k in range(dataset.booking_counts.get(trip_id, 0))
+        ]
+
+    @app.get("/api/bookings/trip/{trip_id}/count")
+    async def booking_count(trip_id: int):
+        await delay()
+        return {"trip_id": trip_id, "count": dataset.booking_counts.get(trip_id, 0)}
+
+    @app.get("/api/bookings/counts")
+    async def booking_counts(scheduled_date: Optional[str] = None):
+        await delay()
+        if scheduled_date and scheduled_date != SCHEDULED_DATE:
+            return {}
+        return json_bytes(dataset.cached_json("booking_counts", lambda: dataset.booking_counts))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trips", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(
+        Dataset(args.trips, seed=args.seed),
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,4 +6,56 @@ const db = new sqlite3.Database(dbPath, (err) => {
   if (err) console.error('SQLite error: ', err);
 });
 
+// Wait this long for another connection's write lock (POST /api/deployments/batch
+// writes on its own connection) instead of failing with SQLITE_BUSY at once.
+const BUSY_TIMEOUT_MS = 5000;
+db.configure('busyTimeout', BUSY_TIMEOUT_MS);
+
+// Tables whose list endpoints send a version ETag (see versioning.js).
+const VERSIONED_TABLES = ['daily_trips', 'routes', 'paths', 'deployments'];
+
+db.serialize(() => {
+  // WAL lets readers (including an agent reading the file directly, see
+  // AGENT_DB_PATH) proceed while the API writes.
+  db.run('PRAGMA journal_mode = WAL', (err) => {
+    if (err) console.error('SQLite WAL error: ', err);
+  });
+
+  // Indexes behind the count and anti-join endpoints; schema_and_seed.sql
+  // only creates them for new databases.
+  [
+    'CREATE INDEX IF NOT EXISTS idx_deployments_trip ON deployments(trip_id)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_trip_status ON bookings(trip_id, status)',
+  ].forEach((sql) => {
+    db.run(sql, (err) => {
+      if (err) console.error('SQLite index error: ', err.message);
+    });
+  });
+
+  // Per-table change counters, bumped by triggers on every write.
+  db.run(
+    `CREATE TABLE IF NOT EXISTS table_versions (
+      table_name TEXT PRIMARY KEY,
+      version INTEGER NOT NULL DEFAULT 0
+    )`
+  );
+  VERSIONED_TABLES.forEach((table) => {
+    db.run('INSERT OR IGNORE INTO table_versions(table_name, version) VALUES (?, 0)', [table]);
+    ['INSERT', 'UPDATE', 'DELETE'].forEach((op) => {
+      db.run(
+        `CREATE TRIGGER IF NOT EXISTS trg_${table}_${op.toLowerCase()}_version
+         AFTER ${op} ON ${table}
+         BEGIN
+           UPDATE table_versions SET version = version + 1 WHERE table_name = '${table}';
+         END`,
+        (err) => {
+          if (err) console.error(`SQLite version trigger error (${table}):`, err.message);
+        }
+      );
+    });
+  });
+});
+
+db.BUSY_TIMEOUT_MS = BUSY_TIMEOUT_MS;
+
 module.exports = db;
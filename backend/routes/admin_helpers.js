@@ -20,4 +20,46 @@ router.get("/deployment_for_trip/:tripId", (req, res) => {
   });
 });
 
+/**
+ * GET /api/helpers/unassigned_trips?scheduled_date=YYYY-MM-DD&limit=100&offset=0
+ * Trips with no deployment (anti-join done in SQLite), optionally for one date.
+ * Returns { trips: [...], total, limit, offset }
+ */
+router.get("/unassigned_trips", (req, res) => {
+  const scheduledDate = req.query.scheduled_date || null;
+  const limit = Math.min(Math.max(parseInt(req.query.limit, 10) || 100, 1), 1000);
+  const offset = Math.max(parseInt(req.query.offset, 10) || 0, 0);
+
+  const where = `
+    WHERE NOT EXISTS (SELECT 1 FROM deployments d WHERE d.trip_id = t.trip_id)
+      AND (? IS NULL OR t.scheduled_date = ?)
+  `;
+  const countQ = `SELECT COUNT(*) AS total FROM daily_trips t ${where}`;
+  const pageQ = `
+    SELECT t.trip_id, t.route_id, t.display_name, t.scheduled_date, t.live_status
+    FROM daily_trips t ${where}
+    ORDER BY t.trip_id
+    LIMIT ? OFFSET ?
+  `;
+
+  db.get(countQ, [scheduledDate, scheduledDate], (err, countRow) => {
+    if (err) {
+      console.error("helpers error:", err);
+      return res.status(500).json({ error: err.message });
+    }
+    db.all(pageQ, [scheduledDate, scheduledDate, limit, offset], (err2, rows) => {
+      if (err2) {
+        console.error("helpers error:", err2);
+        return res.status(500).json({ error: err2.message });
+      }
+      return res.json({
+        trips: rows || [],
+        total: countRow ? countRow.total : 0,
+        limit,
+        offset,
+      });
+    });
+  });
+});
+
 module.exports = router;
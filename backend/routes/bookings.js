@@ -10,6 +10,46 @@ router.get("/trip/:tripId", (req, res) => {
   });
 });
 
+/**
+ * GET /api/bookings/trip/:tripId/count
+ * Returns { trip_id, count } of confirmed bookings without the booking rows.
+ */
+router.get("/trip/:tripId/count", (req, res) => {
+  const tripId = req.params.tripId;
+  db.get(
+    "SELECT COUNT(*) AS count FROM bookings WHERE trip_id = ? AND status = 'confirmed'",
+    [tripId],
+    (err, row) => {
+      if (err) return res.status(500).json({ error: err.message });
+      res.json({ trip_id: Number(tripId), count: row ? row.count : 0 });
+    }
+  );
+});
+
+/**
+ * GET /api/bookings/counts?scheduled_date=YYYY-MM-DD
+ * Returns { "<trip_id>": confirmed_count } for every trip scheduled on that
+ * date (default: today), including trips with no bookings.
+ */
+router.get("/counts", (req, res) => {
+  const scheduledDate = req.query.scheduled_date || null;
+  const q = `
+    SELECT t.trip_id, COUNT(b.booking_id) AS count
+    FROM daily_trips t
+    LEFT JOIN bookings b ON b.trip_id = t.trip_id AND b.status = 'confirmed'
+    WHERE t.scheduled_date = COALESCE(?, date('now'))
+    GROUP BY t.trip_id
+  `;
+  db.all(q, [scheduledDate], (err, rows) => {
+    if (err) return res.status(500).json({ error: err.message });
+    const counts = {};
+    (rows || []).forEach((r) => {
+      counts[r.trip_id] = r.count;
+    });
+    res.json(counts);
+  });
+});
+
 router.post("/", (req, res) => {
   const { trip_id, passenger_name } = req.body;
   db.run("INSERT INTO bookings(trip_id, passenger_name, status) VALUES(?,?, 'confirmed')",
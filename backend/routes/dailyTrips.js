@@ -2,6 +2,7 @@ const express = require("express");
 const fs = require("fs");
 const path = require("path");
 const sqlite3 = require("sqlite3").verbose();
+const { versionETag } = require("../versioning");
 const router = express.Router();
 
 const dataDir = path.join(__dirname, "..", "data");
@@ -14,7 +15,8 @@ async function readFromDb() {
     const db = new sqlite3.Database(dbFile, sqlite3.OPEN_READONLY, (err) => {
       if (err) return resolve(null);
     });
-    db.all("SELECT trip_id, display_name FROM daily_trips LIMIT 1000", (err, rows) => {
+    const q = "SELECT trip_id, route_id, display_name, scheduled_date, live_status FROM daily_trips LIMIT 1000";
+    db.all(q, (err, rows) => {
       db.close();
       if (err) return resolve(null);
       resolve(rows || []);
@@ -22,7 +24,7 @@ async function readFromDb() {
   });
 }
 
-router.get("/", async (req, res) => {
+router.get("/", versionETag(["daily_trips"]), async (req, res) => {
   try {
     // try DB first
     const fromDb = await readFromDb();
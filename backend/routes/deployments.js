@@ -1,7 +1,13 @@
 const express = require("express");
+const path = require("path");
+const sqlite3 = require("sqlite3").verbose();
 const db = require("../db");
+const { BUSY_TIMEOUT_MS } = db;
+const { versionETag } = require("../versioning");
 const router = express.Router();
 
+const dbFile = path.join(__dirname, "..", "data", "movi.db");
+
 /**
  * GET /api/deployments
  * Returns all deployments as:
@@ -10,7 +16,7 @@ const router = express.Router();
  *   ...
  * ]
  */
-router.get("/", (req, res) => {
+router.get("/", versionETag(["deployments"]), (req, res) => {
   const q = "SELECT deployment_id, trip_id, vehicle_id, driver_id FROM deployments";
 
   db.all(q, [], (err, rows) => {
@@ -39,6 +45,79 @@ router.post("/", (req, res) => {
   );
 });
 
+const isId = (v) => Number.isInteger(v);
+const isOptionalId = (v) => v === null || v === undefined || Number.isInteger(v);
+
+/**
+ * POST /api/deployments/batch
+ * Body: { deployments: [{ trip_id, vehicle_id, driver_id }, ...] }
+ * trip_id must be an integer; vehicle_id and driver_id integers or null.
+ * Creates all deployments in one transaction, on its own connection so no
+ * other request's statements land inside it. A trip that already has a
+ * deployment is skipped. Any error rolls the whole batch back.
+ * Returns { created: [{ trip_id, deployment_id }], skipped: [trip_id] }
+ */
+router.post("/batch", (req, res) => {
+  const rows = Array.isArray(req.body && req.body.deployments) ? req.body.deployments : null;
+  if (!rows) return res.status(400).json({ error: "deployments must be an array" });
+  // validated before the transaction opens: a throw in a sqlite callback would
+  // crash the process and leave the transaction open
+  const bad = rows.findIndex(
+    (r) =>
+      !r || typeof r !== "object" || Array.isArray(r) ||
+      !isId(r.trip_id) || !isOptionalId(r.vehicle_id) || !isOptionalId(r.driver_id)
+  );
+  if (bad !== -1) {
+    return res.status(400).json({
+      error: `deployments[${bad}] needs an integer trip_id and integer or null vehicle_id/driver_id`,
+    });
+  }
+
+  const insert = `
+    INSERT INTO deployments(trip_id, vehicle_id, driver_id)
+    SELECT ?, ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM deployments WHERE trip_id = ?)
+  `;
+  const created = [];
+  const skipped = [];
+  let failed = null;
+
+  const conn = new sqlite3.Database(dbFile, (openErr) => {
+    if (openErr) return res.status(500).json({ error: openErr.message });
+    conn.configure("busyTimeout", BUSY_TIMEOUT_MS);
+    const finish = (status, body) => conn.close(() => res.status(status).json(body));
+
+    conn.run("BEGIN IMMEDIATE", (beginErr) => {
+      // without the transaction the inserts would autocommit one by one
+      if (beginErr) return finish(500, { error: beginErr.message });
+
+      conn.serialize(() => {
+        try {
+          rows.forEach(({ trip_id, vehicle_id = null, driver_id = null }) => {
+            conn.run(insert, [trip_id, vehicle_id, driver_id, trip_id], function (err) {
+              if (err) failed = failed || err;
+              else if (this.changes) created.push({ trip_id, deployment_id: this.lastID });
+              else skipped.push(trip_id);
+            });
+          });
+        } catch (err) {
+          return conn.run("ROLLBACK", () => finish(500, { error: err.message }));
+        }
+        // statements run in order, so this callback sees every insert's outcome
+        conn.run("SELECT 1", [], () => {
+          if (failed) {
+            return conn.run("ROLLBACK", () => finish(500, { error: failed.message }));
+          }
+          conn.run("COMMIT", (err) => {
+            if (err) return conn.run("ROLLBACK", () => finish(500, { error: err.message }));
+            finish(201, { created, skipped });
+          });
+        });
+      });
+    });
+  });
+});
+
 /**
  * DELETE /api/deployments/:id
  * Deletes a deployment by deployment_id.
@@ -1,8 +1,9 @@
 const express = require("express");
 const db = require("../db");
+const { versionETag } = require("../versioning");
 const router = express.Router();
 
-router.get("/", (req, res) => {
+router.get("/", versionETag(["routes", "paths"]), (req, res) => {
   const q = `SELECT r.*, p.path_name FROM routes r LEFT JOIN paths p ON p.path_id = r.path_id`;
   db.all(q, [], (err, rows) => {
     if (err) return res.status(500).json({ error: err.message });
@@ -82,6 +82,9 @@ CREATE TABLE bookings (
   FOREIGN KEY(trip_id) REFERENCES daily_trips(trip_id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_deployments_trip ON deployments(trip_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_trip_status ON bookings(trip_id, status);
+
 -- Sample data
 INSERT INTO stops(name, latitude, longitude) VALUES
 ('Gavipuram', 12.9716, 77.5946),
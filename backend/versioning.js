@@ -0,0 +1,29 @@
+// backend/versioning.js
+const db = require("./db");
+
+/**
+ * Middleware for list endpoints: sets a weak ETag built from the change
+ * counters of `tables` (table_versions, maintained by triggers in db.js) and
+ * answers 304 before running the query when the client already has it.
+ * If the counters cannot be read, the request proceeds without an ETag.
+ */
+function versionETag(tables) {
+  const placeholders = tables.map(() => "?").join(",");
+  const q = `SELECT table_name, version FROM table_versions WHERE table_name IN (${placeholders})`;
+
+  return (req, res, next) => {
+    db.all(q, tables, (err, rows) => {
+      if (err || !rows || rows.length !== tables.length) return next();
+      const versions = {};
+      rows.forEach((r) => {
+        versions[r.table_name] = r.version;
+      });
+      const tag = `W/"v-${tables.map((t) => `${t}.${versions[t]}`).join("-")}"`;
+      res.set("ETag", tag);
+      if (req.get("If-None-Match") === tag) return res.status(304).end();
+      next();
+    });
+  };
+}
+
+module.exports = { versionETag };
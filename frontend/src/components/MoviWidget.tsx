@@ -6,8 +6,120 @@ interface MoviWidgetProps {
 }
 
 const AGENT_API = import.meta.env.VITE_AGENT_API || 'http://localhost:8000/ai/agent';
+const AGENT_STREAM_API = import.meta.env.VITE_AGENT_STREAM_API || `${AGENT_API}/stream`;
+const AGENT_WS = import.meta.env.VITE_AGENT_WS || AGENT_API.replace(/^http/, 'ws').replace(/\/ai\/agent$/, '/ai/ws');
 const IMAGE_API = import.meta.env.VITE_IMAGE_API || 'http://localhost:5000/api/image/parse';
 
+// POSTs to the agent's SSE endpoint and calls onProgress for each progress
+// event (intent, trip, route). Resolves with the final result body.
+// EventSource cannot POST, so the stream is read by hand.
+async function streamAgent(body: object, onProgress: (event: string, data: any) => void): Promise<any> {
+  const response = await fetch(AGENT_STREAM_API, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result: any = null;
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      const dataLines: string[] = [];
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+      }
+      if (!dataLines.length) continue;
+      const data = JSON.parse(dataLines.join('\n'));
+      if (event === 'result' || event === 'error') result = data;
+      else onProgress(event, data);
+    }
+  }
+  if (result === null) throw new Error('Agent stream ended without a result');
+  return result;
+}
+
+// One persistent WebSocket session with the agent. Turns are sent one at a
+// time; each resolves with the turn's result frame after its progress frames.
+// The server keeps the pending confirmation for the session.
+class AgentSocket {
+  private url: string;
+  private ws: WebSocket | null = null;
+  private opening: Promise<WebSocket> | null = null;
+  private turns: Promise<unknown> = Promise.resolve();
+  private current: { onProgress: (event: string, data: any) => void; resolve: (data: any) => void; reject: (e: Error) => void } | null = null;
+
+  constructor(url: string) {
+    this.url = url;
+  }
+
+  send(body: object, onProgress: (event: string, data: any) => void): Promise<any> {
+    const turn = this.turns.then(() => this.run(body, onProgress));
+    this.turns = turn.catch(() => undefined);
+    return turn;
+  }
+
+  close() {
+    this.ws?.close();
+    this.ws = null;
+  }
+
+  private async run(body: object, onProgress: (event: string, data: any) => void): Promise<any> {
+    const ws = await this.connect();
+    return new Promise((resolve, reject) => {
+      this.current = { onProgress, resolve, reject };
+      ws.send(JSON.stringify(body));
+    });
+  }
+
+  private connect(): Promise<WebSocket> {
+    if (this.ws?.readyState === WebSocket.OPEN) return Promise.resolve(this.ws);
+    if (!this.opening) {
+      this.opening = new Promise((resolve, reject) => {
+        const ws = new WebSocket(this.url);
+        ws.onopen = () => {
+          this.ws = ws;
+          this.opening = null;
+          resolve(ws);
+        };
+        ws.onmessage = (message) => {
+          const { event, data } = JSON.parse(message.data);
+          if (!this.current) return;
+          if (event === 'result' || event === 'error') {
+            this.current.resolve(data);
+            this.current = null;
+          } else {
+            this.current.onProgress(event, data);
+          }
+        };
+        ws.onerror = () => {
+          this.opening = null;
+          reject(new Error('Agent socket error'));
+        };
+        ws.onclose = () => {
+          this.ws = null;
+          // the turn may already have run on the server; callers must not resend it
+          this.current?.reject(Object.assign(new Error('Agent socket closed'), { sent: true }));
+          this.current = null;
+        };
+      });
+    }
+    return this.opening;
+  }
+}
+
 const SendIcon = () => <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"><line x1="22" y1="2" x2="11" y2="13"></line><polygon points="22 2 15 22 11 13 2 9 22 2"></polygon></svg>;
 const MicIcon = ({isListening}: {isListening: boolean}) => <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round" className={isListening ? 'text-red-500' : ''}><path d="M12 1a3 3 0 0 0-3 3v8a3 3 0 0 0 6 0V4a3 3 0 0 0-3-3z"></path><path d="M19 10v2a7 7 0 0 1-14 0v-2"></path><line x1="12" y1="19" x2="12" y2="23"></line><line x1="8" y1="23" x2="16" y2="23"></line></svg>;
 const ImageIcon = () => <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2" strokeLinecap="round" strokeLinejoin="round"><rect x="3" y="3" width="18" height="18" rx="2" ry="2"></rect><circle cx="8.5" cy="8.5" r="1.5"></circle><polyline points="21 15 16 10 5 21"></polyline></svg>;
@@ -26,10 +138,33 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
   const [pendingId, setPendingId] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [isListening, setIsListening] = useState(false);
+  const [progressText, setProgressText] = useState<string | null>(null);
 
   const recognitionRef = useRef<any>(null);
   const chatEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
+  const socketRef = useRef<AgentSocket | null>(null);
+  // lets follow-ups ("how many bookings does it have") refer to the last trip
+  const sessionIdRef = useRef<string>(crypto.randomUUID());
+
+  useEffect(() => {
+    socketRef.current = new AgentSocket(AGENT_WS);
+    return () => socketRef.current?.close();
+  }, []);
+
+  // Prefer the session socket; fall back to the SSE endpoint if it is unavailable.
+  const sendToAgent = async (request: object, onProgress: (event: string, data: any) => void) => {
+    const body = { ...request, sessionId: sessionIdRef.current };
+    if (socketRef.current) {
+      try {
+        return await socketRef.current.send(body, onProgress);
+      } catch (e: any) {
+        if (e?.sent) throw e;
+        console.warn('Agent socket unavailable, using HTTP stream:', e);
+      }
+    }
+    return streamAgent(body, onProgress);
+  };
 
   useEffect(() => {
     const SpeechRecognition = (window as any).SpeechRecognition || (window as any).webkitSpeechRecognition;
@@ -57,12 +192,12 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
     chatEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
   
-  const speakResponse = (text: string) => {
+  const speakResponse = (text: string, interrupt = true) => {
     if (typeof window.speechSynthesis === 'undefined') {
         console.warn('Speech synthesis not supported');
         return;
     }
-    window.speechSynthesis.cancel();
+    if (interrupt) window.speechSynthesis.cancel();
     const utterance = new SpeechSynthesisUtterance(text);
     window.speechSynthesis.speak(utterance);
   };
@@ -85,22 +220,27 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
     setError(null);
     setPendingId(null); // reset pending id for new request
 
+    let spokeProgress = false;
     try {
-      const apiResponse = await fetch(AGENT_API, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
+      const data = await sendToAgent(
+        {
           input: currentInput,
           imageText: currentImageText,
           currentPage: currentPage,
-        }),
-      });
-
-      if (!apiResponse.ok) {
-        throw new Error(`HTTP error! status: ${apiResponse.status}`);
-      }
-
-      const data = await apiResponse.json();
+        },
+        (event, payload) => {
+          // show (and start saying) what the agent is working on before the
+          // final answer is ready
+          if (event === 'trip' && payload?.display_name) {
+            const note = `Checking ${payload.display_name}.`;
+            setProgressText(note);
+            speakResponse(note);
+            spokeProgress = true;
+          } else if (event === 'route' && payload?.route_display_name) {
+            setProgressText(`Checking route ${payload.route_display_name}.`);
+          }
+        },
+      );
       console.log("AI agent raw response:", data);
 
       const agentResponseText = data.message || data.response || (data.ok === false ? (data.error || JSON.stringify(data)) : 'Sorry, I could not process that.');
@@ -117,7 +257,8 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
       };
       setMessages(prev => [...prev, agentResponse]);
 
-      speakResponse(agentResponseText);
+      // queue behind the progress note instead of cutting it off
+      speakResponse(agentResponseText, !spokeProgress);
 
     } catch (e: any) {
       console.error(e);
@@ -126,6 +267,7 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
       setMessages(prev => [...prev, { id: Date.now() + 1, sender: 'agent', text: errorMessage }]);
     } finally {
       setIsLoading(false);
+      setProgressText(null);
     }
   };
 
@@ -138,21 +280,14 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
     setIsLoading(true);
     setError(null);
     try {
-      const apiResponse = await fetch(AGENT_API, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
+      const data = await sendToAgent(
+        {
           input: "yes",
           pendingId: pendingId,
           currentPage: currentPage
-        }),
-      });
-
-      if (!apiResponse.ok) {
-        throw new Error(`HTTP error! status: ${apiResponse.status}`);
-      }
-
-      const data = await apiResponse.json();
+        },
+        () => {},
+      );
       console.log("AI confirm raw response:", data);
       const agentResponseText = data?.message ?? data?.response ?? JSON.stringify(data);
       setMessages(prev => [...prev, { id: Date.now() + 1, sender: 'agent', text: agentResponseText }]);
@@ -273,7 +408,9 @@ const MoviWidget: React.FC<MoviWidgetProps> = ({ currentPage }) => {
             <div className="flex items-start gap-3">
                 <div className="w-8 h-8 rounded-full bg-brand-blue text-white flex-shrink-0 flex items-center justify-center animate-pulse"><BotIcon /></div>
                 <div className="max-w-xs rounded-lg px-4 py-2 bg-brand-gray-100 text-brand-gray-800 rounded-bl-none">
-                    <div className="h-2 bg-gray-300 rounded-full w-24 animate-pulse"></div>
+                    {progressText
+                      ? <p className="text-sm italic">{progressText}</p>
+                      : <div className="h-2 bg-gray-300 rounded-full w-24 animate-pulse"></div>}
                 </div>
             </div>
         )}